@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import argparse
 import sys
-import yaml
 from datetime import datetime
 from pathlib import Path
 
@@ -9,29 +8,33 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.config import load_config
 from utils.ecmwf_data_retrieval import ECMWFDataGenerator
 
-def main():
-    parser = argparse.ArgumentParser(description="Acquires data for a specific date.")
-    parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format.")
-    parser.add_argument("--config", required=True, help="Path to the config.yaml file.")
-    args = parser.parse_args()
-
-    with open(args.config, 'r') as f:
-        config = yaml.safe_load(f)
-    
+def acquire(date_str: str, config: dict):
+    """Acquires the surface NetCDF file for a single date."""
     use_real_data = config.get('retrieval_mode', 'synthetic') == 'real'
     raw_dir = project_root / config['pipeline_paths']['raw_netcdf_dir']
     raw_dir.mkdir(parents=True, exist_ok=True)
     
-    date_dt = datetime.strptime(args.date, "%Y-%m-%d")
+    date_dt = datetime.strptime(date_str, "%Y-%m-%d")
     nc_filename = f"ecmwf-era5_{date_dt.strftime('%Y%m%d')}_surface.nc"
     nc_filepath = raw_dir / nc_filename
     
-    print(f"--- ACQUIRE TASK: Starting Data Acquisition for {args.date} ---")
+    print(f"--- ACQUIRE TASK: Starting Data Acquisition for {date_str} ---")
     data_generator = ECMWFDataGenerator(use_real_data=use_real_data)
-    data_generator.retrieve_surface_data(nc_filepath, args.date)
+    data_generator.retrieve_surface_data(nc_filepath, date_str)
     print("--- ACQUIRE TASK: Finished ---")
 
+def main():
+    parser = argparse.ArgumentParser(description="Acquires data for a specific date.")
+    parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format.")
+    parser.add_argument("--config", required=True, help="Path to the config.yaml file.")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    
+    acquire(args.date, config)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
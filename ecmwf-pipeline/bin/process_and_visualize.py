@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 import argparse
+import os
 import sys
-import yaml
 import mlflow
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -10,21 +11,18 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.config import load_config
 from src.data_processor import NetCDFReader, BUFREncoder
 from src.quality_control import QualityControl
 from src.ml_quality_control import MLQualityControl
 from utils.visualize_data import generate_comparison_plot
 
-def main():
-    parser = argparse.ArgumentParser(description="Processes NetCDF to BUFR and generates visualizations.")
-    parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format.")
-    parser.add_argument("--config", required=True, help="Path to the config.yaml file.")
-    args = parser.parse_args()
-    
-    with open(args.config, 'r') as f:
-        config = yaml.safe_load(f)
-    
-    base_date = datetime.strptime(args.date, "%Y-%m-%d")
+def process(date_str: str, config: dict, ml_qc: MLQualityControl = None):
+    """
+    Runs QC, BUFR encoding and visualization for a single date.
+    A pre-loaded MLQualityControl can be passed in to avoid reloading the model.
+    """
+    base_date = datetime.strptime(date_str, "%Y-%m-%d")
     date_fn_str = base_date.strftime('%Y%m%d')
     
     # Define file paths based on convention
@@ -36,18 +34,18 @@ def main():
     bufr_filepath = bufr_dir / bufr_filename
 
     if not nc_filepath.exists():
-        print(f"ERROR: Input file not found: {nc_filepath}. Aborting.")
-        sys.exit(1)
+        raise FileNotFoundError(f"Input file not found: {nc_filepath}")
 
     # MLflow Setup
     mlflow.set_tracking_uri(f"file://{project_root / 'mlruns'}")
     mlflow.set_experiment("C3S Data Ingestion (ecFlow)")
     with mlflow.start_run(run_name=f"ingestion_{date_fn_str}") as run:
-        mlflow.log_params({"run_date": args.date, "provider": "ecmwf-era5"})
+        mlflow.log_params({"run_date": date_str, "provider": "ecmwf-era5"})
 
         # Processing Logic
         qc = QualityControl(config['quality_control'])
-        ml_qc = MLQualityControl(project_root / "models/qc_anomaly_model.joblib")
+        if ml_qc is None:
+            ml_qc = MLQualityControl(project_root / "models/qc_anomaly_model.joblib")
         provider_config = config['providers']['ecmwf-era5']
         
         reader = NetCDFReader(str(nc_filepath), provider_config['variable_map'], qc, base_date)
@@ -55,7 +53,7 @@ def main():
         mlflow.log_metrics(stats)
 
         # BUFR Encoding
-        if observations:
+        if len(observations):
             encoder = BUFREncoder()
             encoder.encode(observations, str(bufr_filepath), 'surface')
             
@@ -69,5 +67,52 @@ def main():
         else:
             print("No valid observations found, skipping BUFR and plot generation.")
 
+def _process_one(date_str: str, config_path: str) -> str:
+    """Pool entry point: each worker process parses the config and processes one date."""
+    process(date_str, load_config(config_path))
+    return date_str
+
+def process_many(dates: list, config_path: str, max_workers: int = None) -> list:
+    """
+    Processes independent dates in parallel worker processes.
+    Returns the list of dates that failed.
+    """
+    max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+    failed = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {date_str: executor.submit(_process_one, date_str, config_path) for date_str in dates}
+        for date_str, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"ERROR: Processing failed for {date_str}: {e}")
+                failed.append(date_str)
+    return failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Processes NetCDF to BUFR and generates visualizations.")
+    date_group = parser.add_mutually_exclusive_group(required=True)
+    date_group.add_argument("--date", help="Date in YYYY-MM-DD format.")
+    date_group.add_argument("--dates", help="Comma-separated YYYY-MM-DD dates, processed in parallel.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes for --dates (default: half the CPUs).")
+    parser.add_argument("--config", required=True, help="Path to the config.yaml file.")
+    args = parser.parse_args()
+    
+    if args.dates:
+        dates = [d.strip() for d in args.dates.split(',') if d.strip()]
+        failed = process_many(dates, args.config, args.workers)
+        if failed:
+            print(f"ERROR: {len(failed)}/{len(dates)} dates failed: {', '.join(failed)}. Aborting.")
+            sys.exit(1)
+        return
+
+    config = load_config(args.config)
+    
+    try:
+        process(args.date, config)
+    except FileNotFoundError as e:
+        print(f"ERROR: {e}. Aborting.")
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Persistent pipeline worker.
+
+Running every ecFlow task as a fresh process pays for Python startup, the
+config parse, the IsolationForest unpickle and the mlflow/eccodes imports on
+every date. The worker keeps all of that resident and executes jobs received
+over a local UNIX socket; the ecFlow task scripts use the 'submit' mode as a
+thin client and exit non-zero if the job failed.
+
+Usage:
+    worker.py serve  [--socket PATH] [--jobs N]
+    worker.py submit --config config.yaml --task acquire --date 2025-06-01 [--socket PATH]
+
+If no worker is listening, or it dies before replying, 'submit' runs the task
+in-process so the suite still works without one. If the worker is alive but
+does not reply within --timeout, 'submit' fails and leaves the retry to ecFlow,
+since the job may still be running in the worker.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import traceback
+from pathlib import Path
+
+# Add project root to sys.path to allow importing from 'src' and 'utils'
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.config import load_config
+
+DEFAULT_SOCKET_PATH = project_root / "worker.sock"
+# Longest a client waits for the worker's reply; generous because a job can sit in the CDS queue
+DEFAULT_TIMEOUT_SECONDS = 4 * 3600
+# Jobs the worker runs at the same time; more connections wait in the listen backlog
+MAX_CONCURRENT_JOBS = int(os.getenv("PIPELINE_WORKER_JOBS", 4))
+TASKS = ("acquire", "process_and_visualize")
+
+
+class PipelineWorker:
+    """Holds the ML model and imported task modules between jobs."""
+
+    def __init__(self):
+        # Imported here so that the client mode stays lightweight
+        from acquire_data import acquire
+        from process_and_visualize import process
+        from src.ml_quality_control import MLQualityControl
+
+        self._tasks = {"acquire": acquire, "process_and_visualize": process}
+        self.ml_qc = MLQualityControl(project_root / "models/qc_anomaly_model.joblib")
+
+    def run_job(self, task: str, date: str, config_path: str):
+        if task not in self._tasks:
+            raise ValueError(f"Unknown task '{task}'. Expected one of {TASKS}.")
+        # Loaded per job so edits to the YAML are picked up; the JSON sidecar keeps this cheap
+        config = load_config(config_path)
+        if task == "process_and_visualize":
+            self._tasks[task](date, config, ml_qc=self.ml_qc)
+        else:
+            self._tasks[task](date, config)
+
+
+def _send_message(conn: socket.socket, message: dict):
+    conn.sendall(json.dumps(message).encode() + b"\n")
+
+
+def _recv_message(conn: socket.socket):
+    """Reads one newline-terminated JSON message. Returns None if the peer closed before sending all of it."""
+    buf = b""
+    while not buf.endswith(b"\n"):
+        chunk = conn.recv(4096)
+        if not chunk:
+            return None
+        buf += chunk
+    try:
+        return json.loads(buf)
+    except ValueError:
+        return None
+
+
+def _handle_connection(worker: PipelineWorker, conn: socket.socket):
+    """Runs the job received on one connection and sends back its status."""
+    with conn:
+        try:
+            job = _recv_message(conn)
+            if job is None:
+                return
+            print(f"--- WORKER: Running {job['task']} for {job['date']} ---")
+            worker.run_job(job['task'], job['date'], job['config'])
+            reply = {"status": "ok"}
+        except Exception as e:
+            traceback.print_exc()
+            reply = {"status": "error", "message": f"{type(e).__name__}: {e}"}
+        try:
+            _send_message(conn, reply)
+        except OSError:
+            # The client timed out and gave up on this job
+            print("--- WORKER: Client disconnected before the reply ---")
+
+
+def serve(socket_path: Path, max_jobs: int = MAX_CONCURRENT_JOBS):
+    """
+    Accepts jobs until interrupted, running up to max_jobs at once so that tasks ecFlow
+    runs side by side (e.g. acquire for one date, process for another) don't queue up.
+    Each job runs in a forked child: it inherits the loaded model and imports, while
+    netCDF4/HDF5 and pyplot, which are not thread-safe, stay private to the job.
+    """
+    worker = PipelineWorker()
+    context = multiprocessing.get_context("fork")
+    if socket_path.exists():
+        socket_path.unlink()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+        print(f"--- WORKER: Listening on {socket_path} (up to {max_jobs} concurrent jobs) ---")
+        try:
+            while True:
+                # active_children() also reaps the jobs that have finished
+                while len(multiprocessing.active_children()) >= max_jobs:
+                    time.sleep(0.1)
+                conn, _ = server.accept()
+                context.Process(target=_handle_connection, args=(worker, conn)).start()
+                conn.close() # the child holds its own copy
+        except KeyboardInterrupt:
+            print("--- WORKER: Shutting down ---")
+        finally:
+            if socket_path.exists():
+                socket_path.unlink()
+
+
+def _run_in_process(task: str, date: str, config_path: str) -> int:
+    """Runs one task directly, importing only what it needs; process loads the ML model itself."""
+    try:
+        config = load_config(config_path)
+        if task == "acquire":
+            from acquire_data import acquire
+            acquire(date, config)
+        elif task == "process_and_visualize":
+            from process_and_visualize import process
+            process(date, config)
+        else:
+            raise ValueError(f"Unknown task '{task}'. Expected one of {TASKS}.")
+    except Exception as e:
+        print(f"ERROR: {e}")
+        return 1
+    return 0
+
+
+def submit(socket_path: Path, task: str, date: str, config_path: str,
+           timeout: float = DEFAULT_TIMEOUT_SECONDS) -> int:
+    """Sends one job to the worker and waits for it. Returns a process exit code."""
+    config_path = str(Path(config_path).resolve())
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        try:
+            conn.connect(str(socket_path))
+        except OSError as e:
+            print(f"--- CLIENT: No worker at {socket_path} ({e}), running {task} in-process ---")
+            return _run_in_process(task, date, config_path)
+
+        try:
+            _send_message(conn, {"task": task, "date": date, "config": config_path})
+            reply = _recv_message(conn)
+        except socket.timeout:
+            # The worker may still be running the job, so running it here as well would have two
+            # processes writing the same files; fail and leave the retry to ecFlow instead
+            print(f"ERROR: Worker did not finish {task} for {date} within {timeout:g}s")
+            return 1
+        except OSError:
+            reply = None
+
+    if reply is None:
+        # The connection dropped before a reply: the worker died, so nothing else is running the job
+        print(f"--- CLIENT: Worker at {socket_path} closed without replying, running {task} in-process ---")
+        return _run_in_process(task, date, config_path)
+    if reply.get("status") != "ok":
+        print(f"ERROR: Worker failed to run {task} for {date}: {reply.get('message')}")
+        return 1
+    print(f"--- CLIENT: {task} for {date} completed by worker ---")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent worker for the ingestion pipeline tasks.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Start the worker and wait for jobs.")
+    serve_parser.add_argument("--socket", default=os.getenv("PIPELINE_WORKER_SOCKET", str(DEFAULT_SOCKET_PATH)),
+                              help="Path of the UNIX socket to listen on.")
+    serve_parser.add_argument("--jobs", type=int, default=MAX_CONCURRENT_JOBS,
+                              help="Maximum number of jobs to run at the same time.")
+
+    submit_parser = subparsers.add_parser("submit", help="Send a job to a running worker and wait for it.")
+    submit_parser.add_argument("--socket", default=os.getenv("PIPELINE_WORKER_SOCKET", str(DEFAULT_SOCKET_PATH)),
+                               help="Path of the worker's UNIX socket.")
+    submit_parser.add_argument("--task", required=True, choices=TASKS, help="Pipeline task to run.")
+    submit_parser.add_argument("--date", required=True, help="Date in YYYY-MM-DD format.")
+    submit_parser.add_argument("--config", required=True, help="Path to the config.yaml file.")
+    submit_parser.add_argument("--timeout", type=float,
+                               default=float(os.getenv("PIPELINE_WORKER_TIMEOUT", DEFAULT_TIMEOUT_SECONDS)),
+                               help="Seconds to wait for the worker's reply before failing the task.")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(Path(args.socket), max_jobs=args.jobs)
+    else:
+        sys.exit(submit(Path(args.socket), args.task, args.date, args.config, timeout=args.timeout))
+
+
+if __name__ == "__main__":
+    main()
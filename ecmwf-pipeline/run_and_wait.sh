@@ -15,11 +15,14 @@ export ECF_PORT=31415
 export ECF_HOST=localhost
 SUITE_NAME="c3s_ingestion_pipeline"
 SUITE_RUN_DIR="${PROJECT_ROOT}/${SUITE_NAME}"
+export PIPELINE_WORKER_SOCKET="${PROJECT_ROOT}/worker.sock"
 
 # --- 2. Cleanup Function ---
 cleanup() {
     echo; echo "--- [CLEANUP] Shutting down... ---"
     pkill -9 -f "ecflow_server --port=${ECF_PORT}" || true
+    pkill -f "bin/worker.py serve" || true
+    rm -f "${PIPELINE_WORKER_SOCKET}"
     rm -f "${HOSTNAME}.${ECF_PORT}.ecf.log"
     rm -rf "${SUITE_RUN_DIR}" "${PROJECT_ROOT}/ecflow/def"
 }
@@ -41,6 +44,19 @@ mkdir -p "${SUITE_RUN_DIR}"
 # %ECF_JOBOUT% is the path for the log file.
 export ECF_SUBMIT_CMD="bash %ECF_JOB% > %ECF_JOBOUT% 2>&1 & echo %ECF_RID% > %ECF_JOB%.rid"
 
+# The worker keeps config, model and heavy imports loaded across tasks.
+echo "--- [SETUP] Starting persistent pipeline worker... ---"
+python3 "${PROJECT_ROOT}/bin/worker.py" serve --socket "${PIPELINE_WORKER_SOCKET}" > "${PROJECT_ROOT}/worker.log" 2>&1 &
+# Wait for the socket, so the first task doesn't race the bind and quietly run in-process
+for _ in $(seq 1 120); do
+    [ -S "${PIPELINE_WORKER_SOCKET}" ] && break
+    sleep 0.5
+done
+if [ ! -S "${PIPELINE_WORKER_SOCKET}" ]; then
+    echo "FATAL: Pipeline worker did not start. See ${PROJECT_ROOT}/worker.log"
+    exit 1
+fi
+
 echo "--- [SETUP] Starting ecflow_server with ECF_SUBMIT_CMD override... ---"
 ecflow_server --port=${ECF_PORT} &
 sleep 2
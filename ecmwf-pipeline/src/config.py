@@ -1,6 +1,46 @@
 # src/config.py
+import json
+import os
 import yaml
 from pathlib import Path
+
+# Use the libyaml-backed loader when PyYAML was built with it
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
 def load_config(path: Path):
+    """
+    Loads the YAML config, caching the parsed result in a JSON sidecar
+    (e.g. config.yaml.json). The sidecar records the YAML file's mtime and size
+    and is only reused while both match exactly. It is only written when the
+    config survives a JSON round trip unchanged, so the cache never alters types.
+    """
+    path = Path(path)
+    cache_path = path.with_suffix(path.suffix + '.json')
+    try:
+        stat = path.stat()
+        source = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if cached.get('source') == source:
+            return cached['config']
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass # No usable cache, fall back to parsing the YAML
+
     with open(path, 'r') as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+        config = yaml.load(f, Loader=SafeLoader)
+
+    # Write to a temporary file first so concurrent tasks never read a partial cache
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        text = json.dumps({'source': source, 'config': config})
+        # Non-string keys, dates or tuples would come back as strings and lists: don't cache those
+        if json.loads(text)['config'] != config:
+            return config
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except (OSError, TypeError, ValueError):
+        # Read-only location or values JSON cannot represent: just skip caching
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return config
@@ -9,8 +9,8 @@ It also returns detailed QC statistics for monitoring and tracking.
 """
 import logging
 from pathlib import Path
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
+from typing import Dict
+from datetime import datetime
 import numpy as np
 import netCDF4 as nc
 import eccodes as ec
@@ -21,7 +21,16 @@ from src.ml_quality_control import MLQualityControl
 
 logger = logging.getLogger(__name__)
 
+# Column layout of the surface observations passed from the reader to the encoder
+SURFACE_OBS_DTYPE = np.dtype([
+    ('latitude', 'f4'), ('longitude', 'f4'), ('time', 'datetime64[m]'),
+    ('temperature', 'f4'), ('pressure', 'f4'), ('u_wind', 'f4'), ('v_wind', 'f4'),
+])
+
 class NetCDFReader:
+    # Upper bound for the per-variable HDF5 chunk cache used while reading
+    MAX_CHUNK_CACHE_BYTES = 256 * 1024 * 1024
+
     def __init__(self, filepath: str, var_map: Dict, qc: QualityControl, base_date: datetime):
         """
         Initializes the reader. A base_date is now required as the source of truth for time.
@@ -35,23 +44,43 @@ class NetCDFReader:
         self.var_map = var_map
         self.qc = qc
         self.base_date = base_date
+        self._var_names = {} # (obs_type, standard_name) -> variable name in this file
         if not self.filepath.exists():
             raise FileNotFoundError(f"File not found: {self.filepath}")
 
     def _get_var(self, ds: nc.Dataset, standard_name: str, obs_type: str) -> nc.Variable:
         """Looks up a variable in the NetCDF dataset using the configuration map."""
+        key = (obs_type, standard_name)
+        if key not in self._var_names:
+            self._var_names[key] = self._resolve_var_name(ds, standard_name, obs_type)
+        return ds.variables[self._var_names[key]]
+
+    def _resolve_var_name(self, ds: nc.Dataset, standard_name: str, obs_type: str) -> str:
+        """Maps a standard name to the name used in this file, trying the config map first."""
         provider_var_name = self.var_map[obs_type].get(standard_name)
         if provider_var_name and provider_var_name in ds.variables:
-            return ds.variables[provider_var_name]
+            return provider_var_name
         
         # Fallback for common alternative names if not in map
         fallbacks = {'latitude': 'lat', 'longitude': 'lon'}
         if standard_name in fallbacks and fallbacks[standard_name] in ds.variables:
-            return ds.variables[fallbacks[standard_name]]
+            return fallbacks[standard_name]
             
         raise KeyError(f"Could not find variable for standard name '{standard_name}' in {self.filepath}.")
 
-    def extract_surface_observations_with_stats(self, ml_qc: 'MLQualityControl') -> (List[Dict], Dict):
+    def _read_var(self, ds: nc.Dataset, standard_name: str, obs_type: str) -> np.ndarray:
+        """
+        Reads a whole variable into memory. For chunked NetCDF4 files the HDF5 chunk
+        cache is first sized to hold the variable, so no chunk is decompressed twice.
+        """
+        var = self._get_var(ds, standard_name, obs_type)
+        if ds.data_model.startswith('NETCDF4') and var.chunking() != 'contiguous':
+            cache_bytes = min(var.size * var.dtype.itemsize, self.MAX_CHUNK_CACHE_BYTES)
+            _, nelems, preemption = var.get_var_chunk_cache()
+            var.set_var_chunk_cache(size=max(cache_bytes, 1024 * 1024), nelems=nelems, preemption=preemption)
+        return var[:]
+
+    def extract_surface_observations_with_stats(self, ml_qc: 'MLQualityControl') -> (np.ndarray, Dict):
         """
         Extracts observations and now explicitly returns a dictionary of QC statistics
         for logging in MLflow or other monitoring systems.
@@ -61,10 +90,9 @@ class NetCDFReader:
         
         Returns:
             A tuple containing:
-            - A list of valid observation dictionaries.
+            - A structured array (SURFACE_OBS_DTYPE) of valid observations.
             - A dictionary of detailed QC statistics.
         """
-        observations = []
         stats = {
             'obs_initial_count': 0,
             'obs_pass_physical_qc': 0,
@@ -80,121 +108,153 @@ class NetCDFReader:
         possible_hours = [0, 6, 12, 18]
         
         with nc.Dataset(self.filepath, 'r') as ds:
-            # Read the data variables first using the mapping
-            lats = self._get_var(ds, 'latitude', 'surface')[:]
-            lons = self._get_var(ds, 'longitude', 'surface')[:]
-            t2m = self._get_var(ds, 'temperature', 'surface')
-            msl = self._get_var(ds, 'pressure', 'surface')
-            u10 = self._get_var(ds, 'u_wind', 'surface')
-            v10 = self._get_var(ds, 'v_wind', 'surface')
-
-            # --- Resilient Time Logic ---
-            # Get the number of time steps actually present in the data variable.
-            num_steps_in_file = t2m.shape[0]
-            if num_steps_in_file > len(possible_hours):
-                raise ValueError(f"File contains more time steps ({num_steps_in_file}) than expected ({len(possible_hours)}).")
-            
-            # Use only the hours corresponding to the data we actually have.
-            hours_to_process = possible_hours[:num_steps_in_file]
-            logger.info(f"Data file contains {num_steps_in_file} time steps. Processing hours: {hours_to_process}")
-
-            # --- Loop with Statistics Gathering ---
-            stats['obs_initial_count'] = t2m.size # Total number of grid points across all time steps
-
-            for t_idx, hour in enumerate(hours_to_process):
-                obs_time = self.base_date + timedelta(hours=int(hour))
-                for lat_idx, lat in enumerate(lats):
-                    for lon_idx, lon in enumerate(lons):
-                        obs_data = {
-                            'latitude': float(lat), 'longitude': float(lon), 'time': obs_time,
-                            'temperature': float(t2m[t_idx, lat_idx, lon_idx]),
-                            'pressure': float(msl[t_idx, lat_idx, lon_idx]),
-                            'u_wind': float(u10[t_idx, lat_idx, lon_idx]),
-                            'v_wind': float(v10[t_idx, lat_idx, lon_idx]),
-                        }
-
-                        # Apply QC checks in sequence
-                        if self.qc.check_surface_observation(obs_data):
-                            stats['obs_pass_physical_qc'] += 1
-                            
-                            if ml_qc.check_observation_anomaly(obs_data):
-                                stats['obs_pass_ml_qc'] += 1
-                                observations.append(obs_data)
-                            else:
-                                stats['obs_fail_ml_qc'] += 1
-                        else:
-                            stats['obs_fail_physical_qc'] += 1
-            
-            stats['obs_final_count'] = len(observations)
-            logger.info(f"QC Complete. Final observation count: {stats['obs_final_count']}/{stats['obs_initial_count']}.")
-            return observations, stats
+            # Return plain ndarrays unless a variable actually contains missing values,
+            # so the common case skips masked-array construction entirely.
+            ds.set_always_mask(False)
+
+            # Read each data variable into memory once using the mapping
+            lats = self._read_var(ds, 'latitude', 'surface')
+            lons = self._read_var(ds, 'longitude', 'surface')
+            t2m = self._read_var(ds, 'temperature', 'surface')
+            msl = self._read_var(ds, 'pressure', 'surface')
+            u10 = self._read_var(ds, 'u_wind', 'surface')
+            v10 = self._read_var(ds, 'v_wind', 'surface')
+
+        # --- Resilient Time Logic ---
+        # Get the number of time steps actually present in the data variable.
+        num_steps_in_file = t2m.shape[0]
+        if num_steps_in_file > len(possible_hours):
+            raise ValueError(f"File contains more time steps ({num_steps_in_file}) than expected ({len(possible_hours)}).")
+        
+        # Use only the hours corresponding to the data we actually have.
+        hours_to_process = possible_hours[:num_steps_in_file]
+        logger.info(f"Data file contains {num_steps_in_file} time steps. Processing hours: {hours_to_process}")
+
+        # --- Vectorized Physical QC with Statistics Gathering ---
+        stats['obs_initial_count'] = t2m.size # Total number of grid points across all time steps
+
+        mask = self.qc.check_surface_arrays(t2m, msl, u10, v10)
+        stats['obs_pass_physical_qc'] = int(np.count_nonzero(mask))
+        stats['obs_fail_physical_qc'] = int(mask.size - stats['obs_pass_physical_qc'])
+
+        # --- Batched ML QC over the points that passed physical QC ---
+        t_pass, p_pass, u_pass, v_pass = t2m[mask], msl[mask], u10[mask], v10[mask]
+        # Only rows that passed physical QC reach the model, and none at all if it is disabled
+        if ml_qc.enabled:
+            # Keep features in float32: it halves memory traffic and is the dtype the trees use internally
+            features = np.empty((len(t_pass), 3), dtype=np.float32)
+            features[:, 0] = t_pass
+            features[:, 1] = p_pass
+            np.hypot(u_pass, v_pass, out=features[:, 2]) # Written in place, no temporaries
+            ml_mask = np.asarray(ml_qc.check_batch(features), dtype=bool)
+        else:
+            ml_mask = np.ones(len(t_pass), dtype=bool)
+        stats['obs_pass_ml_qc'] = int(np.count_nonzero(ml_mask))
+        stats['obs_fail_ml_qc'] = int(ml_mask.size - stats['obs_pass_ml_qc'])
+
+        # Build the observation columns only for the points that passed both checks
+        t_idx, lat_idx, lon_idx = (idx[ml_mask] for idx in np.nonzero(mask))
+        obs_times = np.datetime64(self.base_date, 'm') + np.array(hours_to_process, dtype='timedelta64[h]')
+        observations = np.empty(len(t_idx), dtype=SURFACE_OBS_DTYPE)
+        observations['latitude'] = lats[lat_idx]
+        observations['longitude'] = lons[lon_idx]
+        observations['time'] = obs_times[t_idx]
+        observations['temperature'] = t_pass[ml_mask]
+        observations['pressure'] = p_pass[ml_mask]
+        observations['u_wind'] = u_pass[ml_mask]
+        observations['v_wind'] = v_pass[ml_mask]
+
+        stats['obs_final_count'] = len(observations)
+        logger.info(f"QC Complete. Final observation count: {stats['obs_final_count']}/{stats['obs_initial_count']}.")
+        return observations, stats
 
 
 class BUFREncoder:
-    """Encodes a list of observation dictionaries into a BUFR file."""
+    """Encodes surface observation arrays or upper-air observation dictionaries into a BUFR file."""
 
-    def encode(self, observations: List[Dict], output_file: str, obs_type: str):
+    # Surface observations are packed as compressed multi-subset messages of this size
+    SURFACE_SUBSETS_PER_MESSAGE = 4096
+    # Encoded messages are collected in a large userspace buffer and flushed in big writes
+    WRITE_BUFFER_BYTES = 4 * 1024 * 1024
+
+    def encode(self, observations, output_file: str, obs_type: str):
         """
         Main encoding method.
         Args:
-            observations (List[Dict]): The list of valid observation data.
+            observations: The valid observation data; a SURFACE_OBS_DTYPE array for
+                'surface', a list of observation dictionaries for 'upper_air'.
             output_file (str): The path to write the BUFR file to.
             obs_type (str): The type of observation ('surface' or 'upper_air').
         """
-        encoder_map = {'surface': self._encode_surface, 'upper_air': self._encode_upper_air}
+        # Each encoder takes a batch of observations and returns one message handle
+        encoder_map = {
+            'surface': (self._encode_surface, self.SURFACE_SUBSETS_PER_MESSAGE),
+            'upper_air': (lambda batch: self._encode_upper_air(batch[0]), 1),
+        }
         if obs_type not in encoder_map:
             raise ValueError(f"Unknown observation type for BUFR encoding: {obs_type}")
+        encoder, batch_size = encoder_map[obs_type]
 
-        count = 0
+        count = msg_count = 0
         try:
-            with open(output_file, 'wb') as f:
-                for obs in observations:
+            with open(output_file, 'wb', buffering=self.WRITE_BUFFER_BYTES) as f:
+                for start in range(0, len(observations), batch_size):
+                    batch = observations[start:start + batch_size]
                     bufr_msg_handle = None
                     try:
-                        bufr_msg_handle = encoder_map[obs_type](obs)
+                        bufr_msg_handle = encoder(batch)
                         if bufr_msg_handle:
-                            ec.codes_write(bufr_msg_handle, f)
-                            count += 1
+                            f.write(ec.codes_get_message(bufr_msg_handle))
+                            count += len(batch)
+                            msg_count += 1
                     except Exception as e:
-                        logger.error(f"Failed to encode observation: {e}", exc_info=False)
+                        logger.error(f"Failed to encode {len(batch)} observation(s): {e}", exc_info=False)
                     finally:
                         if bufr_msg_handle:
                             ec.codes_release(bufr_msg_handle)
-            logger.info(f"Successfully encoded {count} BUFR messages to {output_file}")
+            logger.info(f"Successfully encoded {count} observations in {msg_count} BUFR messages to {output_file}")
         except IOError as e:
             logger.critical(f"Could not write to output file {output_file}: {e}")
             raise
 
-    def _encode_surface(self, obs: Dict) -> int:
-        """Encodes a single surface observation into a BUFR message handle."""
+    def _encode_surface(self, observations: np.ndarray) -> int:
+        """Encodes a batch of surface observations into a single multi-subset BUFR message handle."""
         bufr = ec.codes_bufr_new_from_samples("BUFR4_local")
-        
+        num_subsets = len(observations)
+
+        # Header keys must be set before the descriptors are expanded
+        ec.codes_set(bufr, "numberOfSubsets", num_subsets)
+        ec.codes_set(bufr, "compressedData", 1)
+
         # Set BUFR headers and descriptors
         # This sequence represents a standard surface observation
         ec.codes_set_array(bufr, "unexpandedDescriptors", [
             301021, 4001, 4002, 4003, 4004, 4005, 12101, 10004, 11003, 11004
         ])
-        
-        ec.codes_set(bufr, "unpack", 1) # Must unpack before setting data values
 
-        # Set data values using BUFR keys
-        ec.codes_set(bufr, "#1#latitude", obs['latitude'])
-        ec.codes_set(bufr, "#1#longitude", obs['longitude'])
-        
-        obs_time = obs['time']
-        ec.codes_set(bufr, "#1#year", obs_time.year)
-        ec.codes_set(bufr, "#1#month", obs_time.month)
-        ec.codes_set(bufr, "#1#day", obs_time.day)
-        ec.codes_set(bufr, "#1#hour", obs_time.hour)
-        ec.codes_set(bufr, "#1#minute", obs_time.minute)
-        
-        ec.codes_set(bufr, "#1#airTemperature", obs['temperature'])
-        ec.codes_set(bufr, "#1#nonCoordinatePressure", obs['pressure'])
-        ec.codes_set(bufr, "#1#u", obs['u_wind'])
-        ec.codes_set(bufr, "#1#v", obs['v_wind'])
-        
+        # Split the datetime64 column into calendar fields without leaving NumPy
+        obs_time = observations['time']
+        days = obs_time.astype('datetime64[D]')
+        months = obs_time.astype('datetime64[M]')
+        hours = obs_time.astype('datetime64[h]')
+
+        # Set data values for all subsets at once using BUFR keys
+        ec.codes_set_array(bufr, "latitude", observations['latitude'].astype(np.float64))
+        ec.codes_set_array(bufr, "longitude", observations['longitude'].astype(np.float64))
+
+        ec.codes_set_array(bufr, "year", obs_time.astype('datetime64[Y]').astype(np.int64) + 1970)
+        ec.codes_set_array(bufr, "month", months.astype(np.int64) % 12 + 1)
+        ec.codes_set_array(bufr, "day", (days - months).astype(np.int64) + 1)
+        ec.codes_set_array(bufr, "hour", (hours - days).astype(np.int64))
+        ec.codes_set_array(bufr, "minute", (obs_time - hours).astype(np.int64))
+
+        ec.codes_set_array(bufr, "airTemperature", observations['temperature'].astype(np.float64))
+        ec.codes_set_array(bufr, "nonCoordinatePressure", observations['pressure'].astype(np.float64))
+        ec.codes_set_array(bufr, "u", observations['u_wind'].astype(np.float64))
+        ec.codes_set_array(bufr, "v", observations['v_wind'].astype(np.float64))
+
         ec.codes_set(bufr, "pack", 1) # Pack the message before writing
-        
+
         return bufr
 
     def _encode_upper_air(self, obs: Dict):
@@ -1,4 +1,5 @@
 import logging
+import math
 import joblib
 import numpy as np
 from pathlib import Path
@@ -21,6 +22,11 @@ class MLQualityControl:
             except Exception as e:
                 logger.error(f"Failed to load ML model: {e}. ML QC will be disabled.")
     
+    @property
+    def enabled(self) -> bool:
+        """True if a model is loaded and observations are actually being checked."""
+        return self.model is not None
+
     def check_observation_anomaly(self, obs: Dict[str, Any]) -> bool:
         """
         Uses the loaded IsolationForest model to predict if an observation is an anomaly.
@@ -29,27 +35,38 @@ class MLQualityControl:
             True if the observation is NOT an anomaly (is an inlier).
             False if the observation IS an anomaly (is an outlier).
         """
-        if not self.model:
-            return True # If model isn't loaded, approve everything.
-
         try:
             # Create a feature vector from the observation, in the same order as training
-            wind_speed = np.sqrt(obs['u_wind']**2 + obs['v_wind']**2)
-            features = np.array([[
-                obs['temperature'],
-                obs['pressure'],
-                wind_speed
-            ]])
-            
+            wind_speed = math.hypot(obs['u_wind'], obs['v_wind'])
+            features = np.array([[obs['temperature'], obs['pressure'], wind_speed]])
+        except Exception as e:
+            logger.warning(f"Could not perform ML QC check due to error: {e}")
+            return True # Fail open: if check fails, approve the data
+
+        if not self.check_batch(features)[0]:
+            logger.debug(f"ML QC FAIL: Observation flagged as anomaly: {obs}")
+            return False
+        return True
+
+    def check_batch(self, features: np.ndarray) -> np.ndarray:
+        """
+        Runs the anomaly model once over a whole batch of observations.
+
+        Args:
+            features (np.ndarray): An (N, 3) array of temperature, pressure and
+                wind speed, in the same order as training.
+
+        Returns:
+            A boolean array of length N, True where the observation is an inlier.
+        """
+        if not self.model or len(features) == 0:
+            return np.ones(len(features), dtype=bool) # If model isn't loaded, approve everything.
+
+        try:
             # predict() returns 1 for inliers and -1 for outliers (anomalies)
-            prediction = self.model.predict(features)
-            
-            if prediction[0] == -1:
-                logger.debug(f"ML QC FAIL: Observation flagged as anomaly: {obs}")
-                return False
-            
-            return True
+            # IsolationForest evaluates its trees in float32, so converting up front avoids a float64 copy
+            return self.model.predict(np.asarray(features, dtype=np.float32)) == 1
 
         except Exception as e:
             logger.warning(f"Could not perform ML QC check due to error: {e}")
-            return True # Fail open: if check fails, approve the data
\ No newline at end of file
+            return np.ones(len(features), dtype=bool) # Fail open: if check fails, approve the data
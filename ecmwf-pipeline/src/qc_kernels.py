@@ -0,0 +1,34 @@
+"""
+Compiled kernels for the grid-wide physical QC checks.
+
+Numba is optional: when it is not installed, NUMBA_AVAILABLE is False and
+QualityControl falls back to the equivalent NumPy expression.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    # fastmath is deliberately off: it assumes no NaNs, and NaN grid points must fail QC.
+    @njit(parallel=True, cache=True)
+    def _surface_qc_kernel(t2m, msl, u10, v10, tmin, tmax, pmin, pmax, wmin, wmax):
+        mask = np.empty(t2m.shape[0], dtype=np.bool_)
+        for i in prange(t2m.shape[0]):
+            mask[i] = ((tmin <= t2m[i] <= tmax) and (pmin <= msl[i] <= pmax) and
+                       (wmin <= u10[i] <= wmax) and (wmin <= v10[i] <= wmax))
+        return mask
+
+
+def surface_qc_mask(t2m: np.ndarray, msl: np.ndarray, u10: np.ndarray, v10: np.ndarray,
+                    temperature_range, pressure_range, wind_range) -> np.ndarray:
+    """
+    Evaluates all surface range checks in a single fused, multi-threaded pass.
+    All inputs must be plain ndarrays of the same shape; the mask has that shape too.
+    """
+    arrays = [np.ascontiguousarray(a).ravel() for a in (t2m, msl, u10, v10)]
+    mask = _surface_qc_kernel(*arrays, *temperature_range, *pressure_range, *wind_range)
+    return mask.reshape(np.shape(t2m))
@@ -1,5 +1,6 @@
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -10,30 +11,57 @@ class QualityControl:
     """
     def __init__(self, qc_params: Dict):
         self.params = qc_params
+        # Pre-extract the ranges as plain floats so the per-observation checks avoid dict lookups
+        self.temperature_range = self.get_range('temperature_K')
+        self.pressure_range = self.get_range('pressure_Pa')
+        self.wind_range = self.get_range('wind_component_ms')
         logger.info(f"QC module initialized with params: {self.params}")
 
-    def _check_range(self, value: float, key: str) -> bool:
-        """Checks if a value is within the configured min/max range."""
+    def get_range(self, key: str) -> Tuple[float, float]:
+        """Returns the configured (min, max) for a key as plain floats, unbounded if not configured."""
         if key not in self.params:
             # If no check is defined, it passes.
-            return True
-        param_range = self.params[key]
-        if not (param_range['min'] <= value <= param_range['max']):
-            logger.debug(f"QC FAIL: {key} value {value} out of range [{param_range['min']}, {param_range['max']}].")
-            return False
-        return True
+            return float('-inf'), float('inf')
+        return float(self.params[key]['min']), float(self.params[key]['max'])
 
     def check_surface_observation(self, obs: Dict[str, Any]) -> bool:
         """
         Runs all configured QC checks for a single surface observation.
+        The observation must carry temperature, pressure, u_wind and v_wind.
         Returns True if all checks pass, False otherwise.
         """
-        checks = {
-            "temperature_K": self._check_range(obs.get('temperature', 0), 'temperature_K'),
-            "pressure_Pa": self._check_range(obs.get('pressure', 0), 'pressure_Pa'),
-            "u_wind_ms": self._check_range(obs.get('u_wind', 0), 'wind_component_ms'),
-            "v_wind_ms": self._check_range(obs.get('v_wind', 0), 'wind_component_ms'),
-        }
-        
-        # Returns False if any of the check values are False
-        return all(checks.values())
\ No newline at end of file
+        tmin, tmax = self.temperature_range
+        pmin, pmax = self.pressure_range
+        wmin, wmax = self.wind_range
+        passed = (tmin <= obs['temperature'] <= tmax and
+                  pmin <= obs['pressure'] <= pmax and
+                  wmin <= obs['u_wind'] <= wmax and
+                  wmin <= obs['v_wind'] <= wmax)
+        if not passed:
+            logger.debug(f"QC FAIL: Observation outside configured ranges: {obs}")
+        return passed
+
+    def check_surface_arrays(self, temperature: np.ndarray, pressure: np.ndarray,
+                             u_wind: np.ndarray, v_wind: np.ndarray) -> np.ndarray:
+        """
+        Vectorized equivalent of check_surface_observation for whole grids.
+        Returns a boolean array, True where all configured checks pass.
+        """
+        arrays = (temperature, pressure, u_wind, v_wind)
+        if not any(isinstance(a, np.ma.MaskedArray) for a in arrays) \
+                and all(np.shape(a) == np.shape(temperature) for a in arrays):
+            # Imported here so numba is only loaded once the compiled kernel can be used
+            from src import qc_kernels
+            if qc_kernels.NUMBA_AVAILABLE:
+                return qc_kernels.surface_qc_mask(*arrays, self.temperature_range,
+                                                  self.pressure_range, self.wind_range)
+
+        tmin, tmax = self.temperature_range
+        pmin, pmax = self.pressure_range
+        wmin, wmax = self.wind_range
+        mask = ((temperature >= tmin) & (temperature <= tmax) &
+                (pressure >= pmin) & (pressure <= pmax) &
+                (u_wind >= wmin) & (u_wind <= wmax) &
+                (v_wind >= wmin) & (v_wind <= wmax))
+        # Masked (missing) grid points never pass QC
+        return np.ma.filled(mask, False)
\ No newline at end of file
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import datetime
+import os
+from pathlib import Path
+
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import load_config
+
+def test_load_config_uses_and_refreshes_json_cache(tmp_path):
+    """The JSON sidecar is written on first load and ignored once the YAML is newer."""
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("quality_control:\n  temperature_K: {min: 180.0, max: 330.0}\n")
+
+    assert load_config(config_path)['quality_control']['temperature_K']['max'] == 330.0
+    cache_path = tmp_path / "config.yaml.json"
+    assert cache_path.exists()
+
+    # Edit the YAML and make sure it is strictly newer than the cache
+    config_path.write_text("quality_control:\n  temperature_K: {min: 180.0, max: 340.0}\n")
+    cache_mtime = cache_path.stat().st_mtime
+    os.utime(config_path, (cache_mtime + 10, cache_mtime + 10))
+
+    assert load_config(config_path)['quality_control']['temperature_K']['max'] == 340.0
+
+
+def test_load_config_detects_edit_with_unchanged_mtime(tmp_path):
+    """An edit that keeps the YAML's mtime (same clock tick) still invalidates the sidecar."""
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("retrieval_mode: synthetic\n")
+    assert load_config(config_path)['retrieval_mode'] == 'synthetic'
+
+    stat = config_path.stat()
+    config_path.write_text("retrieval_mode: real\n")
+    os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert load_config(config_path)['retrieval_mode'] == 'real'
+
+
+def test_load_config_skips_cache_for_non_json_types(tmp_path):
+    """Values JSON would change (int keys, dates) are never cached, so reloads keep their types."""
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("levels: {850: upper, 1000: surface}\n")
+    load_config(config_path)
+    assert load_config(config_path)['levels'][850] == 'upper'
+
+    config_path.write_text("start: 2025-06-01\n")
+    load_config(config_path)
+    assert isinstance(load_config(config_path)['start'], datetime.date)
+
+    assert not (tmp_path / "config.yaml.json").exists()
@@ -9,7 +9,8 @@ import sys
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from src.quality_control import QualityControl
-from src.data_processor import NetCDFReader
+from src.data_processor import NetCDFReader, BUFREncoder, SURFACE_OBS_DTYPE
+import eccodes as ec
 # We mock the ML QC for this unit test to keep it simple
 from unittest.mock import MagicMock
 
@@ -59,7 +60,7 @@ def test_data_processing_and_qc_stats(test_config, synthetic_nc_file):
     # Mock the ML QC class. For this test, we assume all data that passes
     # physical QC also passes ML QC.
     mock_ml_qc = MagicMock()
-    mock_ml_qc.check_observation_anomaly.return_value = True # Always returns True
+    mock_ml_qc.check_batch.side_effect = lambda features: np.ones(len(features), dtype=bool) # Always passes
 
     # 2. EXECUTION
     reader = NetCDFReader(
@@ -86,4 +87,109 @@ def test_data_processing_and_qc_stats(test_config, synthetic_nc_file):
     
     # Verify it's the correct observations that remain
     remaining_temps = {obs['temperature'] for obs in observations}
-    assert remaining_temps == {290.0, 305.0}
\ No newline at end of file
+    assert remaining_temps == {290.0, 305.0}
+
+    # All points come from the single time step at the base date
+    assert set(observations['time'].tolist()) == {test_base_date}
+
+def test_ml_qc_rejections_are_dropped_and_counted(test_config, synthetic_nc_file):
+    """Rows the batch ML check rejects are removed from the output and counted as ML failures."""
+    qc = QualityControl(test_config)
+    var_map = {
+        'surface': {
+            'latitude': 'latitude', 'longitude': 'longitude',
+            'temperature': 't2m', 'pressure': 'msl',
+            'u_wind': 'u10', 'v_wind': 'v10'
+        }
+    }
+    # Flag the 305 K observation as an anomaly; features are (temperature, pressure, wind speed)
+    mock_ml_qc = MagicMock()
+    mock_ml_qc.check_batch.side_effect = lambda features: features[:, 0] < 300.0
+
+    reader = NetCDFReader(str(synthetic_nc_file), var_map, qc, base_date=datetime(2023, 1, 1))
+    observations, stats = reader.extract_surface_observations_with_stats(mock_ml_qc)
+
+    mock_ml_qc.check_batch.assert_called_once()
+    assert len(mock_ml_qc.check_batch.call_args.args[0]) == 2 # only the physical QC survivors
+    assert stats['obs_pass_physical_qc'] == 2
+    assert stats['obs_pass_ml_qc'] == 1
+    assert stats['obs_fail_ml_qc'] == 1
+    assert stats['obs_final_count'] == 1
+    assert observations['temperature'].tolist() == [290.0]
+    assert observations['pressure'].tolist() == [101000.0]
+
+def test_vectorized_qc_matches_scalar_qc(test_config):
+    """The grid-wide QC mask must agree with the per-observation check."""
+    qc = QualityControl(test_config)
+    temps = np.array([290.0, 100.0, 300.0, 305.0])
+    pressures = np.array([101000.0, 102000.0, 90000.0, 104000.0])
+    winds = np.ones(4)
+
+    mask = qc.check_surface_arrays(temps, pressures, winds, winds)
+
+    expected = [
+        qc.check_surface_observation({'temperature': t, 'pressure': p, 'u_wind': 1.0, 'v_wind': 1.0})
+        for t, p in zip(temps, pressures)
+    ]
+    assert mask.tolist() == expected
+
+def test_vectorized_qc_falls_back_when_numba_fails_to_import(test_config, monkeypatch):
+    """An installed but unimportable numba must fall back to the NumPy mask, not fail QC."""
+    monkeypatch.setitem(sys.modules, 'numba', None) # makes 'import numba' raise ImportError
+    monkeypatch.delitem(sys.modules, 'src.qc_kernels', raising=False)
+    monkeypatch.delattr(sys.modules['src'], 'qc_kernels', raising=False)
+    qc = QualityControl(test_config)
+    temps = np.array([290.0, 100.0, 300.0, 305.0])
+    pressures = np.array([101000.0, 102000.0, 90000.0, 104000.0])
+    winds = np.ones(4)
+
+    mask = qc.check_surface_arrays(temps, pressures, winds, winds)
+
+    from src import qc_kernels
+    assert not qc_kernels.NUMBA_AVAILABLE
+    assert mask.tolist() == [True, False, False, True]
+
+
+def test_bufr_encoder_round_trip(tmp_path):
+    """Surface observations split across several multi-subset messages decode back to the same values."""
+    observations = np.zeros(5, dtype=SURFACE_OBS_DTYPE)
+    observations['latitude'] = [50.0, 50.25, 50.5, 50.75, 51.0]
+    observations['longitude'] = [-1.0, 0.0, 1.0, 2.0, 3.0]
+    observations['time'] = np.array(['2024-02-29T18:00', '2024-02-29T18:00', '2023-12-31T06:00',
+                                     '2025-06-01T00:30', '2025-06-01T12:00'], dtype='datetime64[m]')
+    observations['temperature'] = [280.0, 281.5, 282.0, 283.0, 284.0]
+    observations['pressure'] = 101000.0
+    observations['u_wind'] = [1.0, -2.0, 3.0, -4.0, 5.0]
+    observations['v_wind'] = 2.0
+
+    encoder = BUFREncoder()
+    encoder.SURFACE_SUBSETS_PER_MESSAGE = 2 # Force a partial final message
+    output_file = tmp_path / "out.bufr"
+    encoder.encode(observations, str(output_file), 'surface')
+
+    decoded = {key: [] for key in ('latitude', 'longitude', 'year', 'month', 'day', 'hour', 'minute',
+                                   'airTemperature', 'nonCoordinatePressure', 'u', 'v')}
+    with open(output_file, 'rb') as f:
+        while True:
+            bufr = ec.codes_bufr_new_from_file(f)
+            if bufr is None:
+                break
+            ec.codes_set(bufr, 'unpack', 1)
+            num_subsets = ec.codes_get(bufr, 'numberOfSubsets')
+            for key, values in decoded.items():
+                # Compressed messages return a single value for constant columns
+                values.extend(np.resize(ec.codes_get_array(bufr, key), num_subsets))
+            ec.codes_release(bufr)
+
+    times = observations['time'].tolist()
+    np.testing.assert_allclose(decoded['latitude'], observations['latitude'], atol=1e-5)
+    np.testing.assert_allclose(decoded['longitude'], observations['longitude'], atol=1e-5)
+    assert decoded['year'] == [t.year for t in times]
+    assert decoded['month'] == [t.month for t in times]
+    assert decoded['day'] == [t.day for t in times]
+    assert decoded['hour'] == [t.hour for t in times]
+    assert decoded['minute'] == [t.minute for t in times]
+    np.testing.assert_allclose(decoded['airTemperature'], observations['temperature'], atol=0.01)
+    np.testing.assert_allclose(decoded['nonCoordinatePressure'], observations['pressure'], atol=10)
+    np.testing.assert_allclose(decoded['u'], observations['u_wind'], atol=0.1)
+    np.testing.assert_allclose(decoded['v'], observations['v_wind'], atol=0.1)
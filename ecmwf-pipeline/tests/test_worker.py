@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+import socket
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import sys
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "bin"))
+
+import worker
+
+
+class FakeWorker:
+    """Stands in for PipelineWorker so jobs run without the model or real tasks."""
+    def run_job(self, task, date, config_path):
+        if task == "process_and_visualize":
+            raise RuntimeError(f"no input for {date}")
+
+
+@pytest.fixture
+def worker_socket(tmp_path, monkeypatch):
+    """Starts a worker with FakeWorker jobs on a temporary socket and returns its path."""
+    monkeypatch.setattr(worker, "PipelineWorker", FakeWorker)
+    socket_path = tmp_path / "worker.sock"
+    threading.Thread(target=worker.serve, args=(socket_path,), daemon=True).start()
+    for _ in range(100):
+        if socket_path.exists():
+            break
+        time.sleep(0.05)
+    return socket_path
+
+
+@pytest.fixture
+def in_process_runs(monkeypatch):
+    """Records fallback runs instead of executing the real tasks."""
+    runs = []
+    monkeypatch.setattr(worker, "_run_in_process", lambda *args: runs.append(args) or 0)
+    return runs
+
+
+def test_submit_round_trip(worker_socket, in_process_runs, tmp_path):
+    """A job the worker completes returns exit code 0 without running in the client."""
+    assert worker.submit(worker_socket, "acquire", "2025-06-01", str(tmp_path / "config.yaml")) == 0
+    assert in_process_runs == []
+
+
+def test_submit_reports_worker_error(worker_socket, in_process_runs, tmp_path, capsys):
+    """A job that raises in the worker fails the client with the worker's message."""
+    assert worker.submit(worker_socket, "process_and_visualize", "2025-06-01", str(tmp_path / "config.yaml")) == 1
+    assert "RuntimeError: no input for 2025-06-01" in capsys.readouterr().out
+    assert in_process_runs == []
+
+
+def test_submit_without_worker_runs_in_process(in_process_runs, tmp_path):
+    """With nothing listening on the socket the task runs in the client."""
+    assert worker.submit(tmp_path / "missing.sock", "acquire", "2025-06-01", "config.yaml") == 0
+    assert [run[0] for run in in_process_runs] == ["acquire"]
+
+
+def test_submit_timeout_fails_without_rerunning(in_process_runs, tmp_path):
+    """A worker that never replies fails the task instead of running it a second time."""
+    socket_path = tmp_path / "silent.sock"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen() # connections queue in the backlog but are never answered
+        assert worker.submit(socket_path, "acquire", "2025-06-01", "config.yaml", timeout=0.2) == 1
+    assert in_process_runs == []
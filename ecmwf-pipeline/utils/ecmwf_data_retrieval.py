@@ -5,34 +5,57 @@ Can generate synthetic data for testing or retrieve real ERA5 data from
 the Copernicus Climate Data Store (CDS) API. This version is robust
 to filename changes by the CDS API.
 """
+import hashlib
+import json
 import logging
+import shutil
+import threading
 from pathlib import Path
 import numpy as np
 import netCDF4 as nc
 from datetime import datetime
-import shutil
 import os
 
 try:
     from cdsapi import Client as CDSClient
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util import Retry
     ECMWF_API_AVAILABLE = True
 except ImportError:
     ECMWF_API_AVAILABLE = False
     CDSClient = None
 
+try:
+    # Optional: lets real data be downloaded as GRIB and converted to NetCDF locally
+    import xarray as xr
+    import cfgrib
+    GRIB_TRANSCODE_AVAILABLE = True
+except ImportError:
+    GRIB_TRANSCODE_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 class ECMWFDataGenerator:
     """Generates and retrieves test data for the processing pipeline."""
-    def __init__(self, use_real_data: bool = False):
+    # Horizontal chunk edge for synthetic variables: 4 x 64 x 64 float32 values is ~64 KiB per chunk
+    CHUNK_EDGE = 64
+    # HDF5 chunk cache per variable while writing, so no chunk is evicted and re-read before it is complete
+    WRITE_CHUNK_CACHE_BYTES = 64 * 1024 * 1024
+
+    # Finished real-data files, keyed by a hash of the CDS request, so re-runs skip the CDS queue
+    DEFAULT_CACHE_DIR = Path(os.getenv("CDS_CACHE_DIR", Path.home() / ".cache" / "ecmwf-pipeline" / "cds"))
+
+    def __init__(self, use_real_data: bool = False, cache_dir: Path = None):
         self.config = {"area": [55, -10, 45, 5], "grid": [0.25, 0.25]}
         self.cds_client = None
         self.use_real_data = use_real_data
+        self.cache_dir = Path(cache_dir) if cache_dir else self.DEFAULT_CACHE_DIR
 
         if self.use_real_data:
             if ECMWF_API_AVAILABLE:
                 try:
-                    self.cds_client = CDSClient(quiet=True, verify=True)
+                    self.cds_client = self._make_cds_client()
                     logger.info("CDS API client initialized successfully in REAL data mode.")
                 except Exception:
                     logger.warning("Could not initialize CDS Client. Check API credentials in ~/.cdsapirc. Falling back to synthetic data.")
@@ -40,6 +63,22 @@ class ECMWFDataGenerator:
             else:
                 logger.warning("Real data requested, but 'cdsapi' library not found. Falling back to synthetic data.")
 
+    @staticmethod
+    def _make_cds_client():
+        """
+        Creates a CDS client with its own keep-alive HTTP session. cdsapi's default
+        session is a single object shared by every Client, so each client gets a fresh
+        one with a connection pool and retries with backoff for failed connections.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=5, backoff_factor=1))
+        session.mount('https://', adapter)
+        try:
+            return CDSClient(quiet=True, verify=True, session=session)
+        except TypeError:
+            # Newer cdsapi releases hand off to a client that manages its own session
+            return CDSClient(quiet=True, verify=True)
+
     def retrieve_surface_data(self, output_path: Path, date: str):
         """Main method to get data. Delegates to real or synthetic based on initialization."""
         if self.cds_client:
@@ -55,49 +94,135 @@ class ECMWFDataGenerator:
         
         # Define a temporary path for the download
         temp_path = output_path.with_suffix('.download')
+        # GRIB is several times smaller on the wire than CDS NetCDF, so prefer it when it can be converted here
+        grib_path = output_path.with_suffix('.grib')
+        data_format = 'grib' if GRIB_TRANSCODE_AVAILABLE else 'netcdf'
         
         try:
             year, month, day = date.split('-')
-            self.cds_client.retrieve(
-                'reanalysis-era5-single-levels',
-                {
-                    'product_type': 'reanalysis',
-                    'variable': ['2m_temperature', '10m_u_component_of_wind', '10m_v_component_of_wind', 'mean_sea_level_pressure'],
-                    'year': year, 'month': month, 'day': day,
-                    'time': ['00:00', '06:00', '12:00', '18:00'],
-                    'area': self.config['area'], 'grid': self.config['grid'], 'format': 'netcdf',
-                },
-                str(temp_path))
-
-            # Move the completed download to the final destination, overwriting if it exists.
-            shutil.move(temp_path, output_path)
+            dataset = 'reanalysis-era5-single-levels'
+            request = {
+                'product_type': 'reanalysis',
+                'variable': ['2m_temperature', '10m_u_component_of_wind', '10m_v_component_of_wind', 'mean_sea_level_pressure'],
+                'year': year, 'month': month, 'day': day,
+                'time': ['00:00', '06:00', '12:00', '18:00'],
+                'area': self.config['area'], 'grid': self.config['grid'],
+            }
+            # Both download formats end up as the same NetCDF file, so the format is not part of the key
+            cache_path = self._cache_path(dataset, request)
+
+            if cache_path.exists():
+                shutil.copyfile(cache_path, temp_path)
+                os.replace(temp_path, output_path)
+                logger.info(f"Reused cached ERA5 surface data for {date} from {cache_path}")
+                return
+
+            self.cds_client.retrieve(dataset, {**request, 'format': data_format},
+                            str(grib_path if data_format == 'grib' else temp_path))
+            if data_format == 'grib':
+                self._transcode_grib_to_netcdf(grib_path, temp_path)
+
+            # Atomically rename the completed download over the final destination (same directory, so same filesystem).
+            os.replace(temp_path, output_path)
             logger.info(f"Successfully retrieved and saved REAL ERA5 surface data to {output_path}")
+            self._store_in_cache(output_path, cache_path)
 
         except Exception as e:
             logger.error(f"Failed to retrieve ERA5 data from CDS: {e}", exc_info=True)
             logger.info("Executing fallback: generating synthetic data instead.")
             self._generate_synthetic_surface_data(output_path, date)
         finally:
-            # Clean up temporary file if it still exists
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            # Clean up temporary files if they still exist
+            for path in (temp_path, grib_path):
+                path.unlink(missing_ok=True)
 
+    def _cache_path(self, dataset: str, request: dict) -> Path:
+        """Returns the cache location for a CDS request, named by a hash of its contents."""
+        key = hashlib.blake2b(json.dumps([dataset, request], sort_keys=True).encode(), digest_size=8).hexdigest()
+        return self.cache_dir / f"{key}.nc"
+
+    def _store_in_cache(self, output_path: Path, cache_path: Path):
+        """
+        Adds a retrieved file to the cache. It is copied rather than hard-linked: a shared inode
+        would let a later in-place rewrite of output_path (e.g. the synthetic fallback) corrupt
+        the cached real data. Failures only cost the cache.
+        """
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(output_path, tmp_path)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache {output_path} at {cache_path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+
+    def _transcode_grib_to_netcdf(self, grib_path: Path, netcdf_path: Path):
+        """Converts a downloaded GRIB file to NetCDF4 with the same chunked, deflated layout as the synthetic data."""
+        # 2 m, 10 m and mean-sea-level fields form separate GRIB hypercubes, so open them all and
+        # merge; indexpath='' stops cfgrib from leaving a .idx file next to the download
+        parts = cfgrib.open_datasets(str(grib_path), backend_kwargs={'indexpath': ''})
+        with xr.merge(parts, compat='override', combine_attrs='drop_conflicts') as ds:
+            encoding = {}
+            for name, var in ds.data_vars.items():
+                chunks = tuple(min(size, self.CHUNK_EDGE) if dim in ('latitude', 'longitude') else size
+                               for dim, size in var.sizes.items())
+                encoding[name] = {'dtype': 'float32', 'zlib': True, 'complevel': 4, 'shuffle': True,
+                                  'chunksizes': chunks}
+            ds.to_netcdf(netcdf_path, format='NETCDF4', encoding=encoding)
+
+
+    def _grid_axes(self):
+        """
+        Returns the float32 latitude (north to south) and longitude axes of the configured area.
+        linspace hits both edges exactly, where arange could drop or add a point through rounding.
+        """
+        north, west, south, east = self.config['area']
+        dlat, dlon = self.config['grid']
+        n_lat = int(round((north - south) / dlat)) + 1
+        n_lon = int(round((east - west) / dlon)) + 1
+        return (np.linspace(north, south, n_lat, dtype=np.float32),
+                np.linspace(west, east, n_lon, dtype=np.float32))
 
     def _generate_synthetic_surface_data(self, output_path: Path, date: str):
         logger.info(f"Generating SYNTHETIC surface data for {date} at {output_path}")
-        with nc.Dataset(str(output_path), 'w', format='NETCDF4') as ds:
-            lat_range = np.arange(self.config['area'][0], self.config['area'][2] - self.config['grid'][0], -self.config['grid'][0])
-            lon_range = np.arange(self.config['area'][1], self.config['area'][3] + self.config['grid'][1], self.config['grid'][1])
+        # No groups or user-defined types are used, so the classic data model on HDF5 is enough
+        with nc.Dataset(str(output_path), 'w', format='NETCDF4_CLASSIC') as ds:
+            lat_range, lon_range = self._grid_axes()
             hours = [0, 6, 12, 18]
+            coords = {'latitude': lat_range, 'longitude': lon_range, 'time': hours}
             
-            ds.createDimension('latitude', len(lat_range)); ds.createVariable('latitude', 'f4', ('latitude',))[:] = lat_range
-            ds.createDimension('longitude', len(lon_range)); ds.createVariable('longitude', 'f4', ('longitude',))[:] = lon_range
+            ds.createDimension('latitude', len(lat_range)); ds.createVariable('latitude', 'f4', ('latitude',))
+            ds.createDimension('longitude', len(lon_range)); ds.createVariable('longitude', 'f4', ('longitude',))
             # IMPORTANT: Add a 'time' variable to the synthetic data to match the real data structure
-            ds.createDimension('time', len(hours)); ds.createVariable('time', 'i4', ('time',))[:] = hours
+            ds.createDimension('time', len(hours)); ds.createVariable('time', 'i4', ('time',))
             
             shape = (len(hours), len(lat_range), len(lon_range))
-            ds.createVariable('t2m', 'f4', ('time', 'latitude', 'longitude'))[:] = 285 + np.random.randn(*shape) * 10
-            ds.createVariable('msl', 'f4', ('time', 'latitude', 'longitude'))[:] = 101325 + np.random.randn(*shape) * 500
-            ds.createVariable('u10', 'f4', ('time', 'latitude', 'longitude'))[:] = 5 + np.random.randn(*shape) * 5
-            ds.createVariable('v10', 'f4', ('time', 'latitude', 'longitude'))[:] = 2 + np.random.randn(*shape) * 5
-        logger.info("Synthetic data generation complete.")
\ No newline at end of file
+            # One chunk holds every time step of a horizontal tile of at most CHUNK_EDGE x CHUNK_EDGE
+            chunks = (len(hours), min(len(lat_range), self.CHUNK_EDGE), min(len(lon_range), self.CHUNK_EDGE))
+            storage = dict(chunksizes=chunks, zlib=True, complevel=4, shuffle=True, fletcher32=False)
+            # Draw the noise for all four variables at once, directly in float32
+            noise = np.random.default_rng().standard_normal((4,) + shape, dtype=np.float32)
+            fields = {
+                't2m': 285 + noise[0] * 10,
+                'msl': 101325 + noise[1] * 500,
+                'u10': 5 + noise[2] * 5,
+                'v10': 2 + noise[3] * 5,
+            }
+            self._write_fields(ds, coords, fields, ('time', 'latitude', 'longitude'), storage)
+        logger.info("Synthetic data generation complete.")
+
+    def _write_fields(self, ds: nc.Dataset, coords: dict, fields: dict, dimensions: tuple, storage: dict):
+        """
+        Defines a float32 variable for each field, then fills the coordinates and fields,
+        one assignment each. Nothing is written until all definitions are in place.
+        """
+        variables = {}
+        for name in fields:
+            var = ds.createVariable(name, 'f4', dimensions, **storage)
+            var.set_auto_maskandscale(False) # fields are unmasked float32 already
+            var.set_var_chunk_cache(size=self.WRITE_CHUNK_CACHE_BYTES, nelems=1009, preemption=0.75)
+            variables[name] = var
+        for name, values in coords.items():
+            ds.variables[name][:] = values
+        for name, data in fields.items():
+            variables[name][:] = data
\ No newline at end of file
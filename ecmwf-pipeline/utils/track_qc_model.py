@@ -38,20 +38,18 @@ def log_model_to_registry():
         run_id = run.info.run_id
         print(f"MLflow Run ID: {run_id}")
 
-        # Log the model's hyperparameters for reproducibility
+        # Log the model's hyperparameters for reproducibility. Only the estimator's own scalar
+        # parameters are kept, so nested estimators and arrays are not stringified into params.
         print("Logging model parameters...")
-        mlflow.log_params(model.get_params())
+        params = {k: v for k, v in model.get_params(deep=False).items()
+                  if isinstance(v, (int, float, str, bool)) or v is None}
+        mlflow.log_params(params)
         
         # Log a visual HTML representation of the scikit-learn pipeline/model
-        # This is a great artifact for understanding the model's structure
-        model_details_path = Path("model_details.html")
-        with open(model_details_path, "w", encoding="utf-8") as f:
-            f.write(estimator_html_repr(model))
-        
+        # This is a great artifact for understanding the model's structure.
+        # log_text writes straight to the artifact store, with no local temp file.
         print("Logging model visualization artifact...")
-        mlflow.log_artifact(str(model_details_path), "model_visualization")
-        # Clean up the local HTML file
-        model_details_path.unlink()
+        mlflow.log_text(estimator_html_repr(model), artifact_file="model_visualization/model_details.html")
 
         # The most important step: Log the model to the registry
         # MLflow's sklearn integration makes this easy.
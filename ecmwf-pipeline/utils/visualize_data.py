@@ -21,6 +21,10 @@ try:
     import cartopy.crs as ccrs
     import cartopy.feature as cfeature
     CARTOPY_AVAILABLE = True
+    # Shared by every axes, so each Natural Earth shapefile is read and its geometries cached once
+    _COAST = cfeature.NaturalEarthFeature('physical', 'coastline', '110m', edgecolor='black', facecolor='none')
+    _BORDERS = cfeature.NaturalEarthFeature('cultural', 'admin_0_boundary_lines_land', '110m',
+                                            edgecolor='gray', linestyle=':', facecolor='none')
 except ImportError:
     CARTOPY_AVAILABLE = False
     logging.warning("Cartopy library not found. Map plotting will be disabled.")
@@ -29,125 +33,222 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# AGG settings for the dense coastline and border paths: simplify aggressively and draw long paths in chunks
+_RENDER_RC = {'path.simplify': True, 'path.simplify_threshold': 1.0, 'agg.path.chunksize': 10000}
+
+
+class PlotBuilder:
+    """
+    Builds the 4-panel comparison dashboard. The figure and its axes are created
+    once and reused for every render, so batch runs only pay for drawing and
+    PNG encoding per date.
+    """
+    def __init__(self):
+        self.fig, self.axes = plt.subplots(
+            2, 2,
+            figsize=(20, 16),
+            subplot_kw={'projection': ccrs.PlateCarree()},
+            constrained_layout=False
+        )
+        # A fixed layout: no layout solve on every draw and no tight-bbox measuring pass when saving
+        self.fig.subplots_adjust(left=0.04, right=0.96, top=0.93, bottom=0.05, wspace=0.08, hspace=0.1)
+        self._colorbars = []
+
+    def render(self, netcdf_path: str, bufr_path: str, output_path: str, date_str: str):
+        """Redraws the dashboard for one date and saves it to output_path."""
+        # Drop the previous date's artists but keep the figure, canvas and axes
+        for colorbar in self._colorbars:
+            colorbar.remove()
+        self._colorbars = []
+        for ax in self.axes.flat:
+            ax.clear()
+
+        self.fig.suptitle(f'Data Processing Dashboard for {date_str}', fontsize=24, weight='bold')
+
+        with plt.rc_context(_RENDER_RC):
+            # --- 1. Plot Input Gridded Data (Left Column) ---
+            self._colorbars += plot_input_grids(self.axes[:, 0], netcdf_path)
+
+            # --- 2. Plot Output Point Data (Right Column) ---
+            self._colorbars += plot_output_points(self.axes[:, 1], bufr_path)
+
+            logger.info(f"Saving comparison dashboard to {output_path}")
+            self.fig.savefig(output_path, dpi=120)
+
+    def close(self):
+        plt.close(self.fig)
+
+
+# One builder per process, created on first use
+_plot_builder = None
+
 def generate_comparison_plot(netcdf_path: str, bufr_path: str, output_path: str, date_str: str):
     """
     Creates and saves a 4-panel plot for a side-by-side comparison of
     input gridded data and output point data.
     """
+    global _plot_builder
     if not CARTOPY_AVAILABLE:
         logger.error("Cannot generate plots: The 'cartopy' library is required.")
         return
 
-    fig, axes = plt.subplots(
-        2, 2,
-        figsize=(20, 16),
-        subplot_kw={'projection': ccrs.PlateCarree()},
-        constrained_layout=True
-    )
-    fig.suptitle(f'Data Processing Dashboard for {date_str}', fontsize=24, weight='bold')
+    if _plot_builder is None:
+        _plot_builder = PlotBuilder()
+    _plot_builder.render(netcdf_path, bufr_path, output_path, date_str)
 
-    # --- 1. Plot Input Gridded Data (Left Column) ---
-    plot_input_grids(axes[:, 0], netcdf_path)
-
-    # --- 2. Plot Output Point Data (Right Column) ---
-    plot_output_points(axes[:, 1], bufr_path)
-
-    logger.info(f"Saving comparison dashboard to {output_path}")
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
-    plt.close(fig)
+def _read_first_step(ds, name):
+    """Reads the first time step of a variable, with the chunk cache sized to hold one chunk."""
+    var = ds.variables[name]
+    chunking = var.chunking() if ds.data_model.startswith('NETCDF4') else 'contiguous'
+    if chunking != 'contiguous':
+        chunk_bytes = int(np.prod(chunking)) * var.dtype.itemsize
+        _, nelems, preemption = var.get_var_chunk_cache()
+        var.set_var_chunk_cache(size=max(chunk_bytes, 1024 * 1024), nelems=nelems, preemption=preemption)
+    return var[0]
 
 def plot_input_grids(axes, netcdf_path):
-    """Plots temperature, pressure, and wind from the source NetCDF onto two axes."""
+    """
+    Plots temperature, pressure, and wind from the source NetCDF onto two axes.
+    Returns the colorbars it created.
+    """
     ax1, ax2 = axes
+    colorbars = []
     logger.info(f"Visualizing input grids from {netcdf_path}")
 
     try:
         with nc.Dataset(netcdf_path, 'r') as ds:
+            # Plain ndarrays unless a slice actually contains fill values
+            ds.set_always_mask(False)
             # Take the first time step for visualization
-            t2m = ds.variables['t2m'][0, :, :]
-            msl = ds.variables['msl'][0, :, :]
-            u10 = ds.variables['u10'][0, :, :]
-            v10 = ds.variables['v10'][0, :, :]
+            t2m = _read_first_step(ds, 't2m')
+            msl = _read_first_step(ds, 'msl')
+            u10 = _read_first_step(ds, 'u10')
+            v10 = _read_first_step(ds, 'v10')
             lats = ds.variables['latitude'][:]
             lons = ds.variables['longitude'][:]
-            lon_grid, lat_grid = np.meshgrid(lons, lats)
+
+        # The grid is regular, so it is drawn as an image; the extent runs to the outer cell edges.
+        # Row 0 is lats[0], which is the top (origin='upper') whichever way the latitudes run.
+        half_dlon = abs(lons[1] - lons[0]) / 2 if len(lons) > 1 else 0.5
+        half_dlat = abs(lats[1] - lats[0]) / 2 if len(lats) > 1 else 0.5
+        lat_sign = 1 if lats[0] >= lats[-1] else -1
+        extent = [lons[0] - half_dlon, lons[-1] + half_dlon,
+                  lats[-1] - lat_sign * half_dlat, lats[0] + lat_sign * half_dlat]
+        image_kw = dict(extent=extent, origin='upper', interpolation='nearest', transform=ccrs.PlateCarree())
 
         # Plot 1: Input Air Temperature
         ax1.set_title("Input: Gridded 2m Temperature (K)", fontsize=14)
-        mesh = ax1.pcolormesh(lon_grid, lat_grid, t2m, cmap='coolwarm', transform=ccrs.PlateCarree())
-        plt.colorbar(mesh, ax=ax1, orientation='horizontal', pad=0.1, label='Temperature (K)')
+        mesh = ax1.imshow(t2m, cmap='coolwarm', **image_kw)
+        colorbars.append(plt.colorbar(mesh, ax=ax1, orientation='horizontal', pad=0.1, label='Temperature (K)'))
 
         # Plot 2: Input Pressure and Wind
         ax2.set_title("Input: MSL Pressure (Pa) and 10m Wind", fontsize=14)
-        mesh2 = ax2.pcolormesh(lon_grid, lat_grid, msl, cmap='viridis', transform=ccrs.PlateCarree())
-        plt.colorbar(mesh2, ax=ax2, orientation='horizontal', pad=0.1, label='Mean Sea Level Pressure (Pa)')
+        mesh2 = ax2.imshow(msl, cmap='viridis', **image_kw)
+        colorbars.append(plt.colorbar(mesh2, ax=ax2, orientation='horizontal', pad=0.1, label='Mean Sea Level Pressure (Pa)'))
 
         # Subsample wind data for a cleaner plot
         skip = max(1, len(lons) // 25) # Aim for ~25 arrows across
-        q = ax2.quiver(lon_grid[::skip, ::skip], lat_grid[::skip, ::skip],
+        q = ax2.quiver(lons[::skip], lats[::skip],
                        u10[::skip, ::skip], v10[::skip, ::skip],
                        transform=ccrs.PlateCarree(), color='white', scale=250)
         ax2.quiverkey(q, X=0.85, Y=1.05, U=20, label='20 m/s', labelpos='E', fontproperties={'size': 10})
 
         for ax in [ax1, ax2]:
-            ax.add_feature(cfeature.COASTLINE)
-            ax.add_feature(cfeature.BORDERS, linestyle=':')
+            ax.add_feature(_COAST)
+            ax.add_feature(_BORDERS)
             ax.gridlines(draw_labels=True, linewidth=0.5, color='gray', alpha=0.5, linestyle='--')
 
     except Exception as e:
         logger.error(f"Failed to plot input NetCDF data: {e}", exc_info=True)
         ax1.set_title("ERROR: Could not load input data", color='red')
         ax2.set_title("ERROR: Could not load input data", color='red')
+    return colorbars
+
+
+def _get_subset_values(bufr, key, num_subsets):
+    """Reads an array key from an unpacked BUFR message, expanded to one value per subset."""
+    values = ec.codes_get_array(bufr, key)
+    if len(values) == 1 and num_subsets > 1:
+        values = np.full(num_subsets, values[0])
+    return values
+
+
+# Most points drawn per scatter panel; larger outputs are randomly subsampled for display
+MAX_SCATTER_POINTS = 50_000
+
+# Keys read from every output BUFR message, in the row order of the point buffer
+_POINT_KEYS = ('latitude', 'longitude', 'airTemperature', 'nonCoordinatePressure')
 
 
 def plot_output_points(axes, bufr_path):
-    """Plots BUFR observation locations and temperature values."""
+    """Plots BUFR observation locations and temperature values. Returns the colorbars it created."""
     ax1, ax2 = axes
     logger.info(f"Visualizing output points from {bufr_path}")
 
-    lats, lons, temps, pressures = [], [], [], []
+    # One row per key in _POINT_KEYS, grown geometrically so messages are copied straight in
+    points = np.empty((len(_POINT_KEYS), 65536))
+    n = 0
+    new_from_file, codes_get, codes_set, release = (
+        ec.codes_bufr_new_from_file, ec.codes_get, ec.codes_set, ec.codes_release)
     try:
         with open(bufr_path, 'rb') as f:
             while True:
-                bufr = ec.codes_bufr_new_from_file(f)
+                bufr = new_from_file(f)
                 if bufr is None: break
                 
-                ec.codes_set(bufr, 'unpack', 1)
                 # Not all messages have all keys, so read safely
                 try:
-                    lats.append(ec.codes_get(bufr, '#1#latitude'))
-                    lons.append(ec.codes_get(bufr, '#1#longitude'))
-                    temps.append(ec.codes_get(bufr, '#1#airTemperature'))
-                    pressures.append(ec.codes_get(bufr, '#1#nonCoordinatePressure'))
+                    # numberOfSubsets is a header key, so empty messages are skipped without unpacking the data section
+                    num_subsets = codes_get(bufr, 'numberOfSubsets')
+                    if num_subsets == 0:
+                        continue
+                    codes_set(bufr, 'unpack', 1)
+                    # Messages carry many compressed subsets; constant columns come back as a single value
+                    columns = [_get_subset_values(bufr, key, num_subsets) for key in _POINT_KEYS]
+                    if n + num_subsets > points.shape[1]:
+                        grown = np.empty((len(_POINT_KEYS), max(2 * points.shape[1], n + num_subsets)))
+                        grown[:, :n] = points[:, :n]
+                        points = grown
+                    points[:, n:n + num_subsets] = columns
+                    n += num_subsets
                 except ec.CodesInternalError:
                     pass # Ignore messages missing one of these keys
                 finally:
-                    ec.codes_release(bufr)
+                    release(bufr)
     except Exception as e:
          logger.error(f"Failed to read BUFR file {bufr_path}: {e}")
 
-    if not lats:
+    lats, lons, temps, pressures = points[:, :n]
+    if n == 0:
         logger.warning("No valid data points found in BUFR file to plot.")
         ax1.set_title("Output: No BUFR data found", color='orange')
         ax2.set_title("Output: No BUFR data found", color='orange')
-        for ax in [ax1, ax2]: ax.add_feature(cfeature.COASTLINE) # Still draw map
-        return
+        for ax in [ax1, ax2]: ax.add_feature(_COAST) # Still draw map
+        return []
+
+    # Colour limits come from every point, even if only a sample is drawn
+    vmin, vmax = temps.min(), temps.max()
+    if n > MAX_SCATTER_POINTS:
+        # Beyond this the markers overlap at dashboard resolution, so a random sample looks the same
+        idx = np.random.default_rng(0).choice(n, MAX_SCATTER_POINTS, replace=False)
+        lats, lons, temps = lats[idx], lons[idx], temps[idx]
 
     # Plot 1: Processed Temperature at Observation Locations
-    ax1.set_title(f"Output: Processed Temperature ({len(temps)} points)", fontsize=14)
-    sc = ax1.scatter(lons, lats, c=temps, cmap='coolwarm', s=5, transform=ccrs.PlateCarree(), vmin=np.min(temps), vmax=np.max(temps))
-    plt.colorbar(sc, ax=ax1, orientation='horizontal', pad=0.1, label='Temperature (K)')
+    ax1.set_title(f"Output: Processed Temperature ({n} points)", fontsize=14)
+    sc = ax1.scatter(lons, lats, c=temps, cmap='coolwarm', s=5, transform=ccrs.PlateCarree(), vmin=vmin, vmax=vmax)
+    colorbar = plt.colorbar(sc, ax=ax1, orientation='horizontal', pad=0.1, label='Temperature (K)')
 
     # Plot 2: Observation Locations (Sanity Check)
-    ax2.set_title(f"Output: Observation Locations ({len(lats)} points)", fontsize=14)
+    ax2.set_title(f"Output: Observation Locations ({n} points)", fontsize=14)
     ax2.scatter(lons, lats, color='dodgerblue', s=3, transform=ccrs.PlateCarree(), label='Observation Point')
     ax2.legend(loc='upper right')
 
     for ax in [ax1, ax2]:
         ax.set_global()
-        ax.add_feature(cfeature.COASTLINE)
-        ax.add_feature(cfeature.BORDERS, linestyle=':')
+        ax.add_feature(_COAST)
+        ax.add_feature(_BORDERS)
         ax.gridlines(draw_labels=True, linewidth=0.5, color='gray', alpha=0.5, linestyle='--')
+    return [colorbar]
 
 
 def main():
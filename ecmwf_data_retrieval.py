@@ -27,6 +27,11 @@ if not ECMWF_API_AVAILABLE:
 
 class ECMWFTestDataGenerator:
     """Generates and retrieves test data using the stable ERA5 reanalysis datasets."""
+    # Horizontal chunk edge for synthetic variables; each chunk spans every time step (and one level)
+    CHUNK_EDGE = 64
+    # HDF5 chunk cache per variable while writing, so no chunk is evicted and re-read before it is complete
+    WRITE_CHUNK_CACHE_BYTES = 64 * 1024 * 1024
+
     def __init__(self):
         self.config = {"area": [55, 5, 50, 15], "grid": [0.25, 0.25]}
         self.cds_client: Optional[CDSClient] = None
@@ -91,61 +96,113 @@ class ECMWFTestDataGenerator:
             logger.error(f"Failed to retrieve ERA5 pressure level data: {e}. Falling back to synthetic generation.")
             return self._generate_synthetic_upper_air_data(output_path, date)
 
+    def _grid_axes(self):
+        """
+        Returns the float32 latitude (north to south) and longitude axes of the configured area.
+        linspace hits both edges exactly, where arange could drop or add a point through rounding.
+        """
+        north, west, south, east = self.config['area']
+        dlat, dlon = self.config['grid']
+        n_lat = int(round((north - south) / dlat)) + 1
+        n_lon = int(round((east - west) / dlon)) + 1
+        return (np.linspace(north, south, n_lat, dtype=np.float32),
+                np.linspace(west, east, n_lon, dtype=np.float32))
+
     def _generate_synthetic_surface_data(self, output_path: str, date: str) -> str:
         logger.info(f"Generating synthetic surface data with compliant time axis: {output_path}")
-        with nc.Dataset(output_path, 'w', format='NETCDF4') as ds:
-            lat_range = np.arange(self.config['area'][0], self.config['area'][2] - self.config['grid'][0], -self.config['grid'][0])
-            lon_range = np.arange(self.config['area'][1], self.config['area'][3] + self.config['grid'][1], self.config['grid'][1])
+        # No groups or user-defined types are used, so the classic data model on HDF5 is enough
+        with nc.Dataset(output_path, 'w', format='NETCDF4_CLASSIC') as ds:
+            lat_range, lon_range = self._grid_axes()
             hours = [0, 6, 12, 18]
             
-            ds.createDimension('latitude', len(lat_range)); ds.createVariable('latitude', 'f4', ('latitude',))[:] = lat_range
-            ds.createDimension('longitude', len(lon_range)); ds.createVariable('longitude', 'f4', ('longitude',))[:] = lon_range
-            
-            # --- IMPROVEMENT: Create CF-compliant time variable ---
+            ds.createDimension('latitude', len(lat_range))
+            ds.createDimension('longitude', len(lon_range))
             ds.createDimension('time', len(hours))
+
+            ds.createVariable('latitude', 'f4', ('latitude',))
+            ds.createVariable('longitude', 'f4', ('longitude',))
+            # --- IMPROVEMENT: Create CF-compliant time variable ---
             time_var = ds.createVariable('time', 'i4', ('time',))
             time_var.units = f"hours since {date} 00:00:00"
             time_var.calendar = "gregorian"
-            time_var[:] = hours
             
             var_shape_names = ('time', 'latitude', 'longitude')
             var_shape_sizes = (len(hours), len(lat_range), len(lon_range))
+            chunks = (len(hours), min(len(lat_range), self.CHUNK_EDGE), min(len(lon_range), self.CHUNK_EDGE))
+            storage = dict(chunksizes=chunks, zlib=True, complevel=4, shuffle=True, fletcher32=False)
             
+            # Draw the noise for all four variables at once, directly in float32
+            noise = np.random.default_rng().standard_normal((4,) + var_shape_sizes, dtype=np.float32)
+
             # Use real CDS variable names for better compatibility
-            ds.createVariable('2t', 'f4', var_shape_names)[:] = 285 + np.random.randn(*var_shape_sizes) * 5
-            ds.createVariable('msl', 'f4', var_shape_names)[:] = 101325 + np.random.randn(*var_shape_sizes) * 500
-            ds.createVariable('10u', 'f4', var_shape_names)[:] = 5 + np.random.randn(*var_shape_sizes) * 3
-            ds.createVariable('10v', 'f4', var_shape_names)[:] = 2 + np.random.randn(*var_shape_sizes) * 3
+            fields = {
+                '2t': 285 + noise[0] * 5,
+                'msl': 101325 + noise[1] * 500,
+                '10u': 5 + noise[2] * 3,
+                '10v': 2 + noise[3] * 3,
+            }
+            coords = {'latitude': lat_range, 'longitude': lon_range, 'time': hours}
+            self._write_fields(ds, coords, fields, var_shape_names, storage)
         return output_path
 
     def _generate_synthetic_upper_air_data(self, output_path: str, date: str) -> str:
         logger.info(f"Generating synthetic upper-air data with compliant time axis: {output_path}")
-        with nc.Dataset(output_path, 'w', format='NETCDF4') as ds:
-            lat_range = np.arange(self.config['area'][0], self.config['area'][2] - self.config['grid'][0], -self.config['grid'][0])
-            lon_range = np.arange(self.config['area'][1], self.config['area'][3] + self.config['grid'][1], self.config['grid'][1])
+        # No groups or user-defined types are used, so the classic data model on HDF5 is enough
+        with nc.Dataset(output_path, 'w', format='NETCDF4_CLASSIC') as ds:
+            lat_range, lon_range = self._grid_axes()
             hours = [0, 12]
             levels = [1000, 850, 700, 500, 300]
             
-            ds.createDimension('latitude', len(lat_range)); ds.createVariable('latitude', 'f4', ('latitude',))[:] = lat_range
-            ds.createDimension('longitude', len(lon_range)); ds.createVariable('longitude', 'f4', ('longitude',))[:] = lon_range
-            ds.createDimension('level', len(levels)); ds.createVariable('level', 'i4', ('level',))[:] = levels
+            ds.createDimension('latitude', len(lat_range))
+            ds.createDimension('longitude', len(lon_range))
+            ds.createDimension('level', len(levels))
+            ds.createDimension('time', len(hours))
 
+            ds.createVariable('latitude', 'f4', ('latitude',))
+            ds.createVariable('longitude', 'f4', ('longitude',))
+            ds.createVariable('level', 'i4', ('level',))
             # --- IMPROVEMENT: Create CF-compliant time variable ---
-            ds.createDimension('time', len(hours))
             time_var = ds.createVariable('time', 'i4', ('time',))
             time_var.units = f"hours since {date} 00:00:00"
             time_var.calendar = "gregorian"
-            time_var[:] = hours
 
             var_shape_names = ('time', 'level', 'latitude', 'longitude')
             var_shape_sizes = (len(hours), len(levels), len(lat_range), len(lon_range))
-
-            ds.createVariable('t', 'f4', var_shape_names)[:] = 270 + np.random.randn(*var_shape_sizes) * 10
-            ds.createVariable('r', 'f4', var_shape_names)[:] = np.clip(50 + np.random.randn(*var_shape_sizes) * 20, 0, 100)
-            ds.createVariable('u', 'f4', var_shape_names)[:] = 5 + np.random.randn(*var_shape_sizes) * 10
-            ds.createVariable('v', 'f4', var_shape_names)[:] = 0 + np.random.randn(*var_shape_sizes) * 10
+            # A single level per chunk, so a horizontal slice at one level is read from one chunk
+            chunks = (len(hours), 1, min(len(lat_range), self.CHUNK_EDGE), min(len(lon_range), self.CHUNK_EDGE))
+            storage = dict(chunksizes=chunks, zlib=True, complevel=4, shuffle=True, fletcher32=False)
+
+            noise = np.random.default_rng().standard_normal((4,) + var_shape_sizes, dtype=np.float32)
+            fields = {
+                't': 270 + noise[0] * 10,
+                'r': np.clip(50 + noise[1] * 20, 0, 100),
+                'u': 5 + noise[2] * 10,
+                'v': 0 + noise[3] * 10,
+            }
+            coords = {'latitude': lat_range, 'longitude': lon_range, 'level': levels, 'time': hours}
+            self._write_fields(ds, coords, fields, var_shape_names, storage)
         return output_path
 
+    def _write_fields(self, ds: nc.Dataset, coords: dict, fields: dict, dimensions: tuple, storage: dict):
+        """
+        Creates one float32 variable per field, then writes the coordinate values and each
+        field in a single assignment. coords maps the already defined coordinate variables
+        (with their attributes set) to their values. Every variable and attribute is defined
+        before any data is written, and nothing is synced in between; the dataset is
+        flushed once when it is closed.
+        """
+        variables = {}
+        for name in fields:
+            var = ds.createVariable(name, 'f4', dimensions, **storage)
+            # The data is already plain float32 with no fill values, so skip netCDF4's mask/scale pass
+            var.set_auto_maskandscale(False)
+            var.set_var_chunk_cache(size=self.WRITE_CHUNK_CACHE_BYTES, nelems=1009, preemption=0.75)
+            variables[name] = var
+        for name, values in coords.items():
+            ds.variables[name][:] = values
+        for name, data in fields.items():
+            variables[name][:] = data
+
 def main():
     parser = argparse.ArgumentParser(
         description="ECMWF ERA5 Test Data Generator. Retrieves real data from CDS or generates synthetic data.",
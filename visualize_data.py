@@ -7,6 +7,10 @@ output BUFR data. It correctly unpacks BUFR messages to read their contents.
 """
 import logging
 import argparse
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 import numpy as np
 import netCDF4 as nc
@@ -15,19 +19,236 @@ import eccodes as ec
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 try:
     import cartopy.crs as ccrs
     import cartopy.feature as cfeature
     CARTOPY_AVAILABLE = True
+    # Built once and shared by both maps, so the shapefiles are read a single time
+    _PC = ccrs.PlateCarree()
+    _BORD = cfeature.BORDERS.with_scale('110m')
 except ImportError:
     CARTOPY_AVAILABLE = False
     logging.warning("Cartopy library not found. Map plotting is disabled.")
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+try:
+    import numexpr as ne
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    NUMEXPR_AVAILABLE = False
+
+try:
+    from joblib import Memory
+    JOBLIB_AVAILABLE = True
+except ImportError:
+    JOBLIB_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+if NUMBA_AVAILABLE:
+    # fastmath stays off: it lets LLVM assume there are no NaNs, which is exactly what is being tested for
+    @njit(cache=True)
+    def _filter_finite(lat, lon, out_lat, out_lon, k):
+        """Copies the points where both coordinates are finite into out_* from index k; returns the new end."""
+        for i in range(lat.shape[0]):
+            a = lat[i]
+            b = lon[i]
+            if np.isfinite(a) and np.isfinite(b):
+                out_lat[k] = a
+                out_lon[k] = b
+                k += 1
+        return k
+
+
+# Size and resolution of both map figures
+MAP_FIGSIZE = (12, 8)
+MAP_DPI = 150
+# Line vertices of the coastline and border features, kept between runs so the shapefiles are parsed once
+GEOMETRY_CACHE_DIR = Path(os.getenv('CARTOPY_GEOMETRY_CACHE', Path.home() / '.cache' / 'ecmwf-pipeline' / 'cartopy'))
+# Margin around the BUFR locations when the map is zoomed to them
+EXTENT_PAD_DEG = 2.0
+WORLD_EXTENT = (-180, 180, -90, 90)
+# Minimum number of BUFR messages per worker before decoding is spread over processes
+PARALLEL_MESSAGES_PER_WORKER = 32
+
+
+def _downsample_to_pixels(data: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+    """
+    Strides a grid down so it has at most ~1.5 cells per output pixel of the figure;
+    finer detail cannot be resolved on screen and only costs quads in pcolormesh.
+    """
+    target = int(1.5 * MAP_FIGSIZE[0] * MAP_DPI * MAP_FIGSIZE[1] * MAP_DPI)
+    if data.size <= target:
+        return data, lats, lons
+    step = int(np.ceil(np.sqrt(data.size / target)))
+    logger.info(f"Downsampling {data.shape} grid by {step} in each direction for plotting")
+    return data[::step, ::step], lats[::step], lons[::step]
+
+
+class _Buf:
+    """A float64 array that doubles its capacity as values are appended."""
+    __slots__ = ('a', 'n')
+
+    def __init__(self, capacity: int = 1 << 16):
+        self.a = np.empty(capacity, np.float64)
+        self.n = 0
+
+    def reserve(self, extra: int):
+        """Makes room for `extra` more values past the current length."""
+        need = self.n + extra
+        if need > self.a.size:
+            new = np.empty(max(need, 2 * self.a.size), np.float64)
+            new[:self.n] = self.a[:self.n]
+            self.a = new
+
+    def extend(self, arr: np.ndarray):
+        self.reserve(arr.size)
+        self.a[self.n:self.n + arr.size] = arr
+        self.n += arr.size
+
+    def view(self) -> np.ndarray:
+        return self.a[:self.n]
+
+
+def _read_scaled_slice(var, shift: float = 0.0) -> np.ndarray:
+    """
+    Reads the first time step (and first level) of a variable as float32. Masking and
+    scaling are done here instead of by netCDF4, which would unpack to float64 and
+    always build a MaskedArray; a mask is only added if fill values are present.
+    `shift` is added on top of add_offset, e.g. -273.15 to display Kelvin as Celsius.
+    """
+    var.set_auto_maskandscale(False)
+    raw = var[0] if var.ndim == 3 else var[0, 0]
+    scale = getattr(var, 'scale_factor', 1.0)
+    offset = getattr(var, 'add_offset', 0.0) + shift
+    if NUMEXPR_AVAILABLE and (scale != 1.0 or offset != 0.0):
+        # Unpack, scale and shift in one blocked, multi-threaded pass straight from the raw values
+        data = np.empty(raw.shape, dtype=np.float32)
+        ne.evaluate('raw * scale + offset', out=data, casting='unsafe',
+                    local_dict={'raw': raw, 'scale': np.float32(scale), 'offset': np.float32(offset)})
+    else:
+        data = raw.astype(np.float32)
+        if scale != 1.0:
+            np.multiply(data, np.float32(scale), out=data)
+        if offset != 0.0:
+            np.add(data, np.float32(offset), out=data)
+
+    fill = getattr(var, '_FillValue', getattr(var, 'missing_value', None))
+    if fill is not None:
+        missing = raw == fill
+        if missing.any():
+            return np.ma.masked_array(data, mask=missing)
+    return data
+
+def _feature_lines(category: str, name: str, scale: str) -> list:
+    """Returns every line of a Natural Earth feature as an (N, 2) array of lon/lat vertices."""
+    lines = []
+    for geom in cfeature.NaturalEarthFeature(category, name, scale).geometries():
+        for part in getattr(geom, 'geoms', [geom]):
+            line = getattr(part, 'exterior', part)
+            lines.append(np.asarray(line.coords)[:, :2])
+    return lines
+
+
+_line_cache = None
+
+
+def _clip_lines(lines: list, extent) -> list:
+    """
+    Keeps only the parts of each line whose segments overlap the (x0, x1, y0, y1) extent,
+    so a zoomed map hands Agg a few segments instead of every line on the globe.
+    """
+    x0, x1, y0, y1 = extent
+    clipped = []
+    for line in lines:
+        x, y = line[:, 0], line[:, 1]
+        if x.max() < x0 or x.min() > x1 or y.max() < y0 or y.min() > y1:
+            continue
+        # A segment is kept when its bounding box overlaps the extent, so edge crossings survive
+        seg = ((np.maximum(x[:-1], x[1:]) >= x0) & (np.minimum(x[:-1], x[1:]) <= x1) &
+               (np.maximum(y[:-1], y[1:]) >= y0) & (np.minimum(y[:-1], y[1:]) <= y1))
+        steps = np.diff(np.concatenate(([0], seg.view(np.int8), [0])))
+        for start, stop in zip(np.flatnonzero(steps == 1), np.flatnonzero(steps == -1)):
+            clipped.append(line[start:stop + 1])
+    return clipped
+
+
+def _add_cached_lines(ax) -> bool:
+    """
+    Draws the coastlines and borders from the on-disk geometry cache as plain line
+    collections, clipped to the current view. Returns False if the cache can't be used,
+    so the caller can add the regular cartopy features instead.
+    """
+    global _line_cache
+    if not JOBLIB_AVAILABLE:
+        return False
+    try:
+        if _line_cache is None:
+            # Built on first use, so an unwritable cache location doesn't break the import
+            _line_cache = Memory(GEOMETRY_CACHE_DIR, verbose=0).cache(_feature_lines)
+        coast = _line_cache('physical', 'coastline', '110m')
+        borders = _line_cache('cultural', 'admin_0_boundary_lines_land', '110m')
+    except Exception as e:
+        logger.debug(f"Geometry cache unavailable: {e}")
+        return False
+    extent = ax.get_extent(crs=_PC)
+    # Same look and stacking as the cartopy features; autolim is off so the view is left alone
+    ax.add_collection(LineCollection(_clip_lines(coast, extent), colors='black', linewidths=0.5,
+                                     transform=_PC, zorder=1.5), autolim=False)
+    ax.add_collection(LineCollection(_clip_lines(borders, extent), colors='black', linewidths=1.0,
+                                     linestyles=':', transform=_PC, zorder=1.5), autolim=False)
+    return True
+
+
+def _add_map_lines(ax):
+    """Adds coastlines and borders once the view is final, from the cache when possible."""
+    if not _add_cached_lines(ax):
+        ax.coastlines('110m', linewidth=0.5)
+        ax.add_feature(_BORD, linestyle=':')
+
+
+_FIG = None
+
+
+def _map_figure():
+    """
+    Returns the one figure both maps are drawn on, cleared. Reusing it keeps a single
+    Agg canvas and its RGBA buffer alive instead of allocating and tearing one down per plot.
+    """
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure(figsize=MAP_FIGSIZE)
+    else:
+        _FIG.clear()
+    return _FIG
+
+
+def _make_geo_ax(fig, extent=None):
+    """
+    Adds the PlateCarree map axes with gridlines used by both plots. Coastlines and borders
+    are added with _add_map_lines once the data is drawn, so they can be culled to the view.
+    """
+    ax = fig.add_subplot(1, 1, 1, projection=_PC)
+    if extent is not None:
+        ax.set_extent(extent, crs=_PC)
+    if extent == WORLD_EXTENT:
+        # A coarse fixed grid on world maps; regional maps keep cartopy's own spacing,
+        # which would otherwise leave them with one line or none
+        ax.gridlines(draw_labels=True, xlocs=np.arange(-180, 181, 60), ylocs=np.arange(-90, 91, 30), linewidth=0.3)
+    else:
+        ax.gridlines(draw_labels=True, linewidth=0.3)
+    return ax
+
+
 def plot_input_netcdf(filepath: str, output_path: str):
     if not CARTOPY_AVAILABLE:
         logger.warning("Cannot plot input map: Cartopy is not installed.")
@@ -40,91 +261,209 @@ def plot_input_netcdf(filepath: str, output_path: str):
         lons = ds.variables['longitude'][:]
         var_data = ds.variables[main_var_name]
         
-        data_slice = var_data[0, :, :] if len(var_data.shape) == 3 else var_data[0, 0, :, :]
+        units = getattr(var_data, 'units', None)
+        # Temperatures are shown in Celsius; the conversion is folded into the unpacking
+        to_celsius = main_var_name in ('t', 't2m') and units == 'K'
+        data_slice = _read_scaled_slice(var_data, shift=-273.15 if to_celsius else 0.0)
+        data_slice, lats, lons = _downsample_to_pixels(data_slice, lats, lons)
+        if to_celsius:
+            units = '°C'
         
-        fig = plt.figure(figsize=(12, 8))
-        ax = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
-        mesh = ax.pcolormesh(lons, lats, data_slice, transform=ccrs.PlateCarree(), cmap='viridis')
-        ax.add_feature(cfeature.COASTLINE); ax.add_feature(cfeature.BORDERS, linestyle=':')
-        ax.gridlines(draw_labels=True)
-        units_label = f"({var_data.units})" if hasattr(var_data, 'units') else "(units not specified)"
-        plt.colorbar(mesh, ax=ax, orientation='vertical', label=f'{main_var_name} {units_label}')
+        fig = _map_figure()
+        ax = _make_geo_ax(fig)
+        mesh = ax.pcolormesh(lons, lats, data_slice, transform=_PC, cmap='viridis', rasterized=True)
+        _add_map_lines(ax)
+        units_label = f"({units})" if units is not None else "(units not specified)"
+        fig.colorbar(mesh, ax=ax, orientation='vertical', label=f'{main_var_name} {units_label}')
         ax.set_title(f'Input Data from {Path(filepath).name}\n(First Time Step)')
-        plt.savefig(output_path, dpi=150, bbox_inches='tight')
+        fig.savefig(output_path, dpi=MAP_DPI, bbox_inches='tight')
         logger.info(f"Input data map saved to: {output_path}")
-        plt.close(fig)
+        fig.clear()
+
+def _read_locations(bufr):
+    """Unpacks a BUFR message and returns its latitude and longitude arrays, one value per subset."""
+    # Only the data values are read, so eccodes need not build the per-descriptor attribute keys
+    ec.codes_set(bufr, 'skipExtraKeyAttributes', 1)
+    n_subsets = ec.codes_get_long(bufr, 'numberOfSubsets')
+    ec.codes_set(bufr, 'unpack', 1)
+
+    try:
+        lat_arr = ec.codes_get_array(bufr, 'latitude')
+        lon_arr = ec.codes_get_array(bufr, 'longitude')
+    except ec.CodesInternalError:
+        # fallback station keys
+        lat_arr = ec.codes_get_array(bufr, 'stationLatitude')
+        lon_arr = ec.codes_get_array(bufr, 'stationLongitude')
+
+    # eccodes may hand back lists, and compressed messages return one value for a constant column
+    lat_arr = np.asarray(lat_arr, dtype=np.float64)
+    lon_arr = np.asarray(lon_arr, dtype=np.float64)
+    size = max(lat_arr.size, lon_arr.size)
+    if size == 1:
+        size = n_subsets # both columns constant, e.g. a single station
+    if lat_arr.size != size or lon_arr.size != size:
+        lat_arr, lon_arr = np.resize(lat_arr, size), np.resize(lon_arr, size)
+    return lat_arr, lon_arr
+
+
+def _iter_bufr_msgs(filepath: str):
+    """
+    Yields (offset, length) for every BUFR message by scanning for the 'BUFR' magic and
+    skipping ahead by the total length stored in section 0, without decoding anything.
+    """
+    with open(filepath, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return # empty file
+    with mm:
+        i = 0
+        while True:
+            j = mm.find(b'BUFR', i)
+            if j < 0:
+                return
+            # section 0 length = 3 bytes big-endian at offset j+4
+            length = int.from_bytes(mm[j + 4:j + 7], 'big')
+            yield j, length
+            i = j + max(length, 4)
+
+
+def _decode_finite_at(args):
+    """Pool worker: decodes the message at one offset and returns its finite locations."""
+    filepath, offset, length = args
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        message = f.read(length)
+    try:
+        bufr = ec.codes_new_from_message(message)
+    except ec.CodesInternalError as e:
+        logger.debug(f"Skipping message at byte {offset}: {e}")
+        return np.empty(0), np.empty(0)
+    try:
+        lat_arr, lon_arr = _read_locations(bufr)
+    except Exception as e:
+        logger.debug(f"Skipping message at byte {offset}: {e}")
+        return np.empty(0), np.empty(0)
+    finally:
+        ec.codes_release(bufr)
+    mask = np.isfinite(lat_arr) & np.isfinite(lon_arr)
+    return lat_arr[mask], lon_arr[mask]
+
+
+def _collect_parallel(filepath: str, messages: list, workers: int):
+    """Decodes messages in a process pool, which sidesteps the GIL held by the eccodes calls."""
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = [(filepath, offset, length) for offset, length in messages]
+        results = list(executor.map(_decode_finite_at, tasks, chunksize=16))
+    lats = np.concatenate([lat for lat, _ in results])
+    lons = np.concatenate([lon for _, lon in results])
+    return lats, lons, len(messages)
+
+
+@contextmanager
+def _open_bufr(f):
+    """Reads the next BUFR message from f, yielding its handle (None at EOF) and releasing it afterwards."""
+    bufr = ec.codes_bufr_new_from_file(f)
+    try:
+        yield bufr
+    finally:
+        if bufr is not None:
+            ec.codes_release(bufr)
+
+
+def _collect_serial(filepath: str):
+    """Decodes messages one after another in this process."""
+    # Finite locations are written straight into these, grown geometrically as messages arrive
+    lat_buf, lon_buf = _Buf(), _Buf()
+    # Scratch for the NumPy finite test, reused across messages instead of allocated per message
+    mask_buf = np.empty(1 << 16, np.bool_)
+    tmp_buf = np.empty(1 << 16, np.bool_)
+    msg_count = 0
+
+    with open(filepath, 'rb') as f:
+        try:
+            while True:
+                with _open_bufr(f) as bufr:
+                    if bufr is None:
+                        break # EOF
+
+                    msg_count += 1
+                    try:
+                        lat_arr, lon_arr = _read_locations(bufr)
+                        if NUMBA_AVAILABLE:
+                            # One fused pass: finite test and copy, no temporary mask
+                            lat_buf.reserve(lat_arr.size)
+                            lon_buf.reserve(lat_arr.size)
+                            lat_buf.n = lon_buf.n = _filter_finite(lat_arr, lon_arr, lat_buf.a, lon_buf.a, lat_buf.n)
+                        else:
+                            size = lat_arr.size
+                            if size > mask_buf.size:
+                                mask_buf = np.empty(max(size, 2 * mask_buf.size), np.bool_)
+                                tmp_buf = np.empty(mask_buf.size, np.bool_)
+                            mask = np.isfinite(lat_arr, out=mask_buf[:size])
+                            np.logical_and(mask, np.isfinite(lon_arr, out=tmp_buf[:size]), out=mask)
+                            lat_buf.extend(lat_arr[mask])
+                            lon_buf.extend(lon_arr[mask])
+                    except Exception as e:
+                        logger.debug(f"Skipping message #{msg_count}: {e}")
+        except (ec.CodesInternalError, OSError) as e:
+            # A truncated or unreadable file: keep what was decoded before it
+            logger.error(f"Stopped reading {filepath} after {msg_count} messages: {e}")
+
+    return lat_buf.view(), lon_buf.view(), msg_count
+
 
-def plot_output_bufr(filepath: str, output_path: str):
+def plot_output_bufr(filepath: str, output_path: str, global_view: bool = False):
+    """
+    Plots the BUFR observation locations. The map is zoomed to the data plus a small margin,
+    which draws far fewer coastline and border segments for regional files than a world map;
+    pass global_view=True for the whole globe.
+    """
     if not CARTOPY_AVAILABLE:
         logger.warning("Cannot plot output map: Cartopy is not installed.")
         return
         
     logger.info(f"Visualizing output BUFR file: {filepath}")
-    lats, lons = [], []
-    msg_count = valid_points = 0
-
-    with open(filepath, 'rb') as f:
-        while True:
-            # 1) grab the handle (or EOF)
-            try:
-                bufr = ec.codes_bufr_new_from_file(f)
-            except ec.CodesInternalError:
-                # true EOF for this API
-                break
-
-            if bufr is None:
-                # some bindings return None at EOF instead of raising
-                break
-
-            msg_count += 1
-            try:
-                # unpack and read array keys
-                ec.codes_set(bufr, 'unpack', 1)
-
-                try:
-                    lat_arr = ec.codes_get_array(bufr, 'latitude')
-                    lon_arr = ec.codes_get_array(bufr, 'longitude')
-                except ec.CodesInternalError:
-                    # fallback station keys
-                    lat_arr = ec.codes_get_array(bufr, 'stationLatitude')
-                    lon_arr = ec.codes_get_array(bufr, 'stationLongitude')
-
-                for lat, lon in zip(lat_arr, lon_arr):
-                    if np.isfinite(lat) and np.isfinite(lon):
-                        lats.append(lat)
-                        lons.append(lon)
-                        valid_points += 1
-
-            except Exception as e:
-                logger.debug(f"Skipping message #{msg_count}: {e}")
-
-            finally:
-                # only release if we got a real handle
-                ec.codes_release(bufr)
+    messages = list(_iter_bufr_msgs(filepath))
+    # Only worth a pool when every worker gets a good number of messages
+    workers = min(os.cpu_count() or 1, len(messages) // PARALLEL_MESSAGES_PER_WORKER)
+    if workers > 1:
+        lats, lons, msg_count = _collect_parallel(filepath, messages, workers)
+    else:
+        lats, lons, msg_count = _collect_serial(filepath)
+    valid_points = lats.size
 
     logger.info(f"Processed {msg_count} messages, found {valid_points} valid locations")
-    if not lats:
+    if not valid_points:
         logger.warning("No valid locations found – skipping plot.")
         return
 
-    fig = plt.figure(figsize=(12, 8))
-    ax  = fig.add_subplot(1, 1, 1, projection=ccrs.PlateCarree())
-    ax.scatter(lons, lats,
-               marker='.', s=10,
-               transform=ccrs.PlateCarree(),
-               label='BUFR Obs')
-    ax.add_feature(cfeature.COASTLINE)
-    ax.add_feature(cfeature.BORDERS, linestyle=':')
-    ax.gridlines(draw_labels=True)
+    if global_view:
+        extent = WORLD_EXTENT
+    else:
+        extent = (max(lons.min() - EXTENT_PAD_DEG, -180), min(lons.max() + EXTENT_PAD_DEG, 180),
+                  max(lats.min() - EXTENT_PAD_DEG, -90), min(lats.max() + EXTENT_PAD_DEG, 90))
+
+    fig = _map_figure()
+    ax  = _make_geo_ax(fig, extent)
+    # Only the dense point layer is rasterized; coastlines, borders and gridlines stay vector.
+    # Every point shares one style, so a marker-only Line2D is drawn as a single path instead
+    # of a scatter PathCollection that carries and transforms per-point sizes and colours.
+    # Projected once here in one vectorized PROJ call, so the artist needs no cartopy transform at draw time
+    pts = ax.projection.transform_points(_PC, lons, lats)
+    ax.plot(pts[:, 0], pts[:, 1],
+            linestyle='none', marker='.', markersize=2,
+            color='tab:blue', antialiased=len(lons) <= 10_000,
+            label='BUFR Obs', rasterized=True)
+    _add_map_lines(ax)
     ax.legend()
-    ax.set_global()
     ax.set_title(
         f'BUFR observation locations\n'
         f'({valid_points} points from {msg_count} messages)'
     )
-    plt.savefig(output_path, dpi=150, bbox_inches='tight')
+    fig.savefig(output_path, dpi=MAP_DPI, bbox_inches='tight')
     logger.info(f"Output data map saved to: {output_path}")
-    plt.close(fig)
+    fig.clear()
 
 
 
@@ -133,12 +472,19 @@ def main():
     parser.add_argument('--netcdf_file', required=True, help='Path to the input NetCDF file')
     parser.add_argument('--bufr_file', required=True, help='Path to the output BUFR file')
     parser.add_argument('--output_dir', required=True, help='Directory to save the plots')
+    parser.add_argument('--global_map', action='store_true', help='Show the whole globe on the BUFR map instead of zooming to the data')
     args = parser.parse_args()
     
     output_dir = Path(args.output_dir)
-    output_dir.mkdir(exist_ok=True)
-    plot_input_netcdf(args.netcdf_file, str(output_dir / 'input_data_map.png'))
-    plot_output_bufr(args.bufr_file, str(output_dir / 'output_locations_map.png'))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    # The two maps are independent, so they are drawn and encoded side by side. Processes
+    # rather than threads, since pyplot's global figure state is not thread-safe.
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        input_map = executor.submit(plot_input_netcdf, args.netcdf_file, str(output_dir / 'input_data_map.png'))
+        output_map = executor.submit(plot_output_bufr, args.bufr_file, str(output_dir / 'output_locations_map.png'),
+                                     global_view=args.global_map)
+        input_map.result()
+        output_map.result()
 
 if __name__ == '__main__':
     main()